@@ -0,0 +1,157 @@
+# backfill_audio_metadata.py
+"""
+Backfills audio_duration / audio_codec / audio_sample_rate for voicemails
+ingested before header probing existed.
+
+Each file is probed with ranged GETs (first/last 64 KB) instead of a full
+download, with bounded parallelism. Progress is checkpointed after every
+committed batch, so an interrupted run picks up where it stopped. Rows
+whose probe raised are retried at the end and hold the checkpoint back
+until they succeed.
+
+Usage:
+    python backfill_audio_metadata.py [--workers 16] [--batch-size 200] [--retries 3] [--restart]
+"""
+
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import update
+
+from run import app
+from database import db, Voicemail
+from services.storage_service import get_storage
+from utils.audio_metadata import probe_stored, audio_columns
+
+CHECKPOINT_FILE = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)),
+    ".backfill_audio_metadata.checkpoint"
+)
+
+
+def read_checkpoint():
+    try:
+        with open(CHECKPOINT_FILE) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(last_id):
+    tmp_path = f"{CHECKPOINT_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(last_id))
+    os.replace(tmp_path, CHECKPOINT_FILE)
+
+
+def pending_query(after_id):
+    return (
+        db.session.query(Voicemail.id, Voicemail.audio_url)
+        .filter(Voicemail.audio_duration.is_(None))
+        .filter(Voicemail.audio_url.isnot(None))
+        .filter(Voicemail.id > after_id)
+    )
+
+
+def backfill(workers, batch_size, restart, retries):
+    storage = get_storage()
+    last_id = 0 if restart else read_checkpoint()
+
+    total = pending_query(last_id).count()
+    print(f"🔥 Backfilling audio metadata for {total} voicemails (after id {last_id})")
+
+    done = updated = failed = 0
+    started_at = time.monotonic()
+
+    # Rows whose probe raised (e.g. transient S3 errors), retried at the
+    # end; the checkpoint never moves past the first of them
+    errored = {}
+
+    def probe(row):
+        try:
+            return row, probe_stored(storage, row.audio_url), None
+        except Exception as e:
+            print(f"⚠️ Voicemail {row.id}: probe failed ({e})")
+            return row, None, e
+
+    def probe_batch(pool, rows):
+        results = list(pool.map(probe, rows))
+
+        values = [
+            {"id": row.id, **audio_columns(info)}
+            for row, info, error in results
+            if info is not None and info.duration is not None
+        ]
+
+        # Bulk UPDATE by primary key (one executemany per batch)
+        if values:
+            db.session.execute(update(Voicemail), values)
+        db.session.commit()
+
+        for row, info, error in results:
+            if error is None:
+                errored.pop(row.id, None)
+            else:
+                errored[row.id] = row
+
+        return len(values)
+
+    def checkpoint():
+        write_checkpoint(min(last_id, min(errored) - 1) if errored else last_id)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = pending_query(last_id).order_by(Voicemail.id.asc()).limit(batch_size).all()
+            if not rows:
+                break
+
+            batch_updated = probe_batch(pool, rows)
+
+            last_id = rows[-1].id
+            checkpoint()
+
+            done += len(rows)
+            updated += batch_updated
+            failed += len(rows) - batch_updated
+
+            elapsed = time.monotonic() - started_at
+            print(
+                f"✅ {done}/{total} probed ({updated} updated, {failed} unknown, "
+                f"{len(errored)} errored) — {done / elapsed:.1f}/s, last id {last_id}"
+            )
+
+        for attempt in range(retries):
+            if not errored:
+                break
+
+            time.sleep(2 ** attempt)
+            print(f"🔁 Retrying {len(errored)} errored voicemails (attempt {attempt + 1}/{retries})")
+
+            rows = sorted(errored.values(), key=lambda row: row.id)
+            for start in range(0, len(rows), batch_size):
+                batch_updated = probe_batch(pool, rows[start:start + batch_size])
+                updated += batch_updated
+                failed -= batch_updated
+            checkpoint()
+
+    if errored:
+        print(
+            f"⚠️ {len(errored)} voicemails still erroring (first id {min(errored)}); "
+            f"the next run resumes from there"
+        )
+
+    print(f"🎉 Backfill complete: {updated} updated, {failed} without metadata")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill voicemail audio metadata")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent ranged reads")
+    parser.add_argument("--batch-size", type=int, default=200, help="rows per commit")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    parser.add_argument("--retries", type=int, default=3, help="passes over rows whose probe errored")
+    args = parser.parse_args()
+
+    with app.app_context():
+        backfill(args.workers, args.batch_size, args.restart, args.retries)
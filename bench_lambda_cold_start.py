@@ -0,0 +1,142 @@
+# bench_lambda_cold_start.py
+"""
+Measures ingest Lambda cold-start cost locally.
+
+Each run starts a fresh interpreter (like a new Lambda sandbox) and records:
+- import time of lambda_function
+- first invocation latency (cold) and second invocation latency (warm)
+
+S3 is replaced with an in-memory fake and the webhook with a local HTTP
+server, so the numbers reflect our own code: module load, MIME parsing
+and the webhook round-trip.
+
+Usage:
+    python bench_lambda_cold_start.py [--runs 10] [--with-boto3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+LAMBDA_DIR = os.path.join(BASE_DIR, "lambda_package")
+
+CHILD = r"""
+import json, sys, threading, time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from email.message import EmailMessage
+
+class Webhook(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = b'{"success": true}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+
+server = HTTPServer(("127.0.0.1", 0), Webhook)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+import os
+os.environ["INGEST_WEBHOOK_URL"] = f"http://127.0.0.1:{server.server_port}/webhooks/email-ingest"
+
+msg = EmailMessage()
+msg["To"] = "clinictoken@ingest.voicecarepro.com"
+msg["Subject"] = "Voicemail"
+msg.set_content("New voicemail attached.")
+msg.add_attachment(b"\xff\xfb\x90\x00" * 25000, maintype="audio", subtype="mpeg", filename="voicemail.mp3")
+raw_email = msg.as_bytes()
+
+class Body:
+    def read(self):
+        return raw_email
+
+class FakeS3:
+    def get_object(self, Bucket, Key):
+        return {"Body": Body()}
+    def put_object(self, **kwargs):
+        return {}
+
+boto3_seconds = None
+if WITH_BOTO3:
+    t = time.perf_counter()
+    import boto3
+    boto3.client("s3", region_name="us-east-1")
+    boto3_seconds = time.perf_counter() - t
+
+sys.path.insert(0, LAMBDA_DIR)
+t = time.perf_counter()
+import lambda_function
+import_seconds = time.perf_counter() - t
+
+lambda_function._s3 = FakeS3()
+event = {"Records": [{"s3": {"bucket": {"name": "ses-inbox"}, "object": {"key": "email-1"}}}]}
+
+t = time.perf_counter()
+first = lambda_function.lambda_handler(event, None)
+first_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+lambda_function.lambda_handler(event, None)
+warm_seconds = time.perf_counter() - t
+
+assert first["statusCode"] == 200, first
+
+print(json.dumps({
+    "import": import_seconds,
+    "first_invocation": first_seconds,
+    "warm_invocation": warm_seconds,
+    "boto3": boto3_seconds,
+}))
+"""
+
+
+def run_once(with_boto3):
+    code = f"LAMBDA_DIR = {LAMBDA_DIR!r}\nWITH_BOTO3 = {with_boto3!r}\n" + CHILD
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(label, values):
+    ms = [v * 1000 for v in values]
+    print(
+        f"{label:<20} median {statistics.median(ms):8.2f} ms   "
+        f"min {min(ms):8.2f} ms   max {max(ms):8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest Lambda cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--with-boto3",
+        action="store_true",
+        help="also time importing boto3 and creating an S3 client (first-use cost)"
+    )
+    args = parser.parse_args()
+
+    samples = [run_once(args.with_boto3) for _ in range(args.runs)]
+
+    print(f"Ingest Lambda cold start ({args.runs} fresh interpreters)")
+    summarize("import", [s["import"] for s in samples])
+    summarize("first invocation", [s["first_invocation"] for s in samples])
+    summarize("warm invocation", [s["warm_invocation"] for s in samples])
+    if args.with_boto3:
+        summarize("boto3 client", [s["boto3"] for s in samples])
+
+
+if __name__ == "__main__":
+    main()
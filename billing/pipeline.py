@@ -0,0 +1,41 @@
+# billing/pipeline.py
+
+from billing.plans import PLANS
+
+# Stages after transcription, in run order. Transcription itself always runs.
+#   extraction          LLM patient info pass, stored on the voicemail; runs
+#                       alongside triage and only feeds the triage prompt
+#                       when TRIAGE_USES_EXTRACTION=true
+#   triage              LLM summary + urgency
+#   department_routing  triage also returns recommended action / department;
+#                       without it triage_category comes from the keyword
+#                       intent classifier
+#   urgent_alert        stream triage and email as soon as urgency is urgent/high
+#   crisis_review       second-pass psychiatric crisis triage
+#   triage_card         upsert the TriageCard the daily digest reads
+#   notification        per-voicemail email to the clinic
+PIPELINE_STAGES = (
+    "extraction",
+    "triage",
+    "department_routing",
+    "urgent_alert",
+    "crisis_review",
+    "triage_card",
+    "notification",
+)
+
+DEFAULT_PLAN = "starter"
+
+
+def get_pipeline_stages(clinic):
+    """
+    Returns the frozenset of stages a clinic gets: its own
+    pipeline_stages override if set, otherwise its plan's.
+    """
+    override = getattr(clinic, "pipeline_stages", None) if clinic else None
+    if override:
+        return frozenset(stage for stage in override if stage in PIPELINE_STAGES)
+
+    plan_name = clinic.plan_name if clinic else None
+    plan = PLANS.get(plan_name) or PLANS[DEFAULT_PLAN]
+    return frozenset(plan["pipeline_stages"])
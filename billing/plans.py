@@ -10,6 +10,12 @@ PLANS = {
             "intent_detection",
             "email_routing",
             "admin_dashboard"
+        ],
+        # Stages run per voicemail (see billing/pipeline.py)
+        "pipeline_stages": [
+            "triage",
+            "triage_card",
+            "notification"
         ]
     },
 
@@ -24,6 +30,14 @@ PLANS = {
             "admin_dashboard",
             "priority_routing",
             "advanced_filters"
+        ],
+        "pipeline_stages": [
+            "extraction",
+            "triage",
+            "department_routing",
+            "urgent_alert",
+            "triage_card",
+            "notification"
         ]
     },
 
@@ -33,6 +47,15 @@ PLANS = {
         "overage_allowed": True,
         "features": [
             "everything"
+        ],
+        "pipeline_stages": [
+            "extraction",
+            "triage",
+            "department_routing",
+            "urgent_alert",
+            "crisis_review",
+            "triage_card",
+            "notification"
         ]
     }
 }
@@ -2,6 +2,10 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm.attributes import set_committed_value
+import os
+import socket
 import logging
 
 db = SQLAlchemy()
@@ -15,6 +19,9 @@ VOICEMAIL_STATUSES = {
     "received",
     "queued",
     "transcribing",
+    "awaiting_transcript",
+    "transcribed",
+    "deferred",
     "extracting",
     "summarizing",
     "triaging",
@@ -23,6 +30,47 @@ VOICEMAIL_STATUSES = {
     "needs_review",
 }
 
+# Pipeline-internal progress states (see Voicemail.advance)
+PROGRESS_STATUSES = {"transcribing", "extracting", "summarizing", "triaging"}
+
+# Legal transitions. "failed" is reachable from anywhere; staying in the
+# same status is always allowed.
+_AFTER_TRANSCRIPT = {"extracting", "summarizing", "triaging", "deferred", "completed", "needs_review"}
+
+VOICEMAIL_TRANSITIONS = {
+    "received": {"queued", "transcribing", "awaiting_transcript", "transcribed", "completed"},
+    "queued": {"received", "transcribing", "awaiting_transcript", "completed"},
+    "transcribing": {"awaiting_transcript"} | _AFTER_TRANSCRIPT,
+    "awaiting_transcript": {"transcribed", "received"},
+    "transcribed": _AFTER_TRANSCRIPT,
+    "deferred": {"transcribed", "completed", "needs_review"},
+    "extracting": {"transcribing", "summarizing", "triaging", "completed", "needs_review"},
+    "summarizing": {"transcribing", "triaging", "completed", "needs_review"},
+    "triaging": {"transcribing", "completed", "needs_review"},
+    "completed": {"received", "needs_review"},
+    "needs_review": {"received", "completed"},
+    "failed": {"received", "transcribing", "transcribed"},
+}
+
+# How much of the pipeline's progress other sessions see:
+#   all    commit every progress status (one transaction per stage)
+#   first  commit only the first progress status (claims the voicemail),
+#          then coalesce the rest into the final transaction
+#   none   only the final status is committed
+STATUS_PROGRESS_VISIBILITY = os.getenv("STATUS_PROGRESS_VISIBILITY", "first")
+
+
+# Recorded on every voicemail_events row
+WORKER_NAME = os.getenv("WORKER_NAME") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class InvalidStatusTransition(ValueError):
+    pass
+
+
+class StaleVoicemailState(Exception):
+    """Another actor changed the voicemail's status since it was loaded."""
+
 # --------------------
 # Clinic Model
 # --------------------
@@ -48,6 +96,9 @@ class Clinic(db.Model):
     overage_count = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
 
+    # Optional per-clinic stage list; NULL = the plan's pipeline_stages
+    pipeline_stages = db.Column(db.JSON, nullable=True)
+
     users = db.relationship("User", backref="clinic", lazy=True)
     voicemails = db.relationship("Voicemail", backref="clinic", lazy=True)
 
@@ -100,11 +151,20 @@ class Voicemail(db.Model):
     )
 
     filename = db.Column(db.String(255), nullable=False)
-    audio_url = db.Column(db.String(255), nullable=True)
+    # One voicemail per stored object (ingest retries / double completes)
+    audio_url = db.Column(db.String(255), nullable=True, unique=True, index=True)
     audio_duration = db.Column(db.Integer, nullable=True)
+    audio_codec = db.Column(db.String(20), nullable=True)
+    audio_sample_rate = db.Column(db.Integer, nullable=True)
+
+    # Trimmed / downsampled copy sent to the ASR provider (optional)
+    processed_audio_url = db.Column(db.String(255), nullable=True)
+    preprocess_bytes_saved = db.Column(db.Integer, nullable=True)
+    preprocess_seconds_saved = db.Column(db.Float, nullable=True)
 
     source = db.Column(db.String(50), nullable=False)
     received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status_changed_at = db.Column(db.DateTime, nullable=True)
 
     status = db.Column(
         db.String(32),
@@ -112,6 +172,9 @@ class Voicemail(db.Model):
         default="received"
     )
 
+    # Bumped by every status change; update_status compare-and-swaps on it
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     # Retry Metadata
     retry_count = db.Column(db.Integer, default=0)
     last_error_at = db.Column(db.DateTime, nullable=True)
@@ -120,6 +183,19 @@ class Voicemail(db.Model):
     transcription_confidence = db.Column(db.Float, nullable=True)
     transcription_provider = db.Column(db.String(50), nullable=True)
     transcribed_at = db.Column(db.DateTime, nullable=True)
+
+    # Deepgram callback mode: outstanding request, matched on the webhook
+    transcription_request_id = db.Column(db.String(64), nullable=True)
+    transcription_submitted_at = db.Column(db.DateTime, nullable=True)
+
+    # Overnight batch lane: set once a deferred voicemail is submitted
+    llm_batch_id = db.Column(
+        db.Integer,
+        db.ForeignKey("llm_batches.id"),
+        nullable=True
+    )
+    # Handed back to the real-time worker by the lane: never defer again
+    skip_deferral = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     failure_reason = db.Column(db.Text, nullable=True)
 
     # ============================================================
@@ -127,6 +203,7 @@ class Voicemail(db.Model):
     # ============================================================
 
     summary = db.Column(db.Text, nullable=True)
+    patient_info = db.Column(db.JSON, nullable=True)
     triage_category = db.Column(db.String(100), nullable=True)
     urgency_level = db.Column(db.String(50), nullable=True)
 
@@ -134,31 +211,83 @@ class Voicemail(db.Model):
     # CENTRALIZED STATUS TRANSITION METHOD
     # ============================================================
 
-    def update_status(self, new_status, failure_reason=None):
+    def update_status(self, new_status, failure_reason=None, commit=True):
         """
         Centralized voicemail status update.
-        Handles logging, timestamps, and failure tracking.
+        Validates the transition and handles logging, timestamps and
+        failure tracking. commit=False leaves the change in the current
+        transaction so it lands together with the stage's results.
+
+        The write is a single UPDATE ... WHERE version = <loaded version>
+        issued at commit time (no row lock is held in between); if another
+        actor changed the status meanwhile, the commit raises
+        StaleVoicemailState.
         """
 
         if new_status not in VOICEMAIL_STATUSES:
             raise ValueError(f"Invalid voicemail status: {new_status}")
 
+        old_status = self.status
+        if (
+            old_status
+            and new_status != old_status
+            and new_status != "failed"
+            and new_status not in VOICEMAIL_TRANSITIONS.get(old_status, ())
+        ):
+            raise InvalidStatusTransition(
+                f"Voicemail {self.id}: illegal status change {old_status} → {new_status}"
+            )
+
         logger.info(
-            f"Voicemail {self.id} status change: {self.status} → {new_status}"
+            f"Voicemail {self.id} status change: {old_status} → {new_status}"
         )
 
-        self.status = new_status
+        now = datetime.utcnow()
+        entered_at = self.status_changed_at or self.received_at
+
+        changes = {"status": new_status}
+
+        if new_status != old_status and self.id is not None:
+            _buffer_status_event(self.id, old_status, new_status, entered_at, now)
+            changes["status_changed_at"] = now
 
         # Handle failure metadata
         if new_status == "failed":
-            self.last_error_at = datetime.utcnow()
+            changes["last_error_at"] = now
             if failure_reason:
-                self.failure_reason = failure_reason
+                changes["failure_reason"] = failure_reason
         else:
             # Clear failure info on non-failed states
-            self.failure_reason = None
+            changes["failure_reason"] = None
 
-        db.session.commit()
+        if self.id is None:
+            # Not inserted yet: nothing to race with
+            for column, value in changes.items():
+                setattr(self, column, value)
+        else:
+            # Kept out of the ORM's own UPDATE; written by the CAS at commit
+            for column, value in changes.items():
+                set_committed_value(self, column, value)
+            pending = db.session.info.setdefault("voicemail_status_cas", {})
+            pending.setdefault(self.id, [self, self.version, set()])[2].update(changes)
+
+        if commit:
+            db.session.commit()
+
+    def advance(self, new_status):
+        """
+        Moves to an intermediate pipeline status. Whether it is committed
+        now or coalesced into the final transaction depends on
+        STATUS_PROGRESS_VISIBILITY.
+        """
+        first_step = self.status not in PROGRESS_STATUSES
+
+        commit = (
+            STATUS_PROGRESS_VISIBILITY == "all"
+            or (STATUS_PROGRESS_VISIBILITY == "first" and first_step)
+        )
+
+        self.update_status(new_status, commit=commit)
 
     def __repr__(self):
         return f"<Voicemail {self.id}>"
@@ -234,3 +363,156 @@ class DigestLog(db.Model):
 
     def __repr__(self):
         return f"<DigestLog {self.id}>"
+
+
+# --------------------
+# LLMBatch Model (overnight batch lane)
+# --------------------
+
+class LLMBatch(db.Model):
+    __tablename__ = "llm_batches"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    provider = db.Column(db.String(20), nullable=False)  # "openai" or "local"
+
+    provider_batch_id = db.Column(db.String(100), nullable=True)
+
+    # "claiming" (rows claimed, not yet sent), "submitted", "completed",
+    # "failed" or "abandoned"
+    status = db.Column(db.String(20), nullable=False, default="submitted")
+
+    request_count = db.Column(db.Integer, default=0)
+
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    error_message = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f"<LLMBatch {self.id}>"
+
+
+# --------------------
+# VoicemailEvent Model (append-only status log)
+# --------------------
+
+class VoicemailEvent(db.Model):
+    __tablename__ = "voicemail_events"
+    __table_args__ = (
+        db.Index("ix_voicemail_events_from_status_created_at", "from_status", "created_at"),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+
+    voicemail_id = db.Column(db.Integer, nullable=False, index=True)
+
+    from_status = db.Column(db.String(32), nullable=True)
+
+    to_status = db.Column(db.String(32), nullable=False)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Time spent in from_status (BigInteger: Integer overflows after ~25 days)
+    duration_ms = db.Column(db.BigInteger, nullable=True)
+
+    worker = db.Column(db.String(64), nullable=True)
+
+    def __repr__(self):
+        return f"<VoicemailEvent {self.voicemail_id} {self.from_status}→{self.to_status}>"
+
+
+def _buffer_status_event(voicemail_id, from_status, to_status, entered_at, now):
+    """Buffered; written in bulk when the transaction commits."""
+    db.session.info.setdefault("voicemail_events", []).append({
+        "voicemail_id": voicemail_id,
+        "from_status": from_status,
+        "to_status": to_status,
+        "created_at": now,
+        "duration_ms": int((now - entered_at).total_seconds() * 1000) if entered_at else None,
+        "worker": WORKER_NAME[:64],
+    })
+
+
+def bulk_update_status(filters, new_status, **values):
+    """
+    Moves every voicemail matching filters to new_status, for jobs that
+    requeue many at once (no transition validation). Each row is a
+    compare-and-swap on its version, so in-flight update_status() calls
+    on those rows lose; status_changed_at and the status events are
+    recorded as usual. Does not commit. Returns the number moved.
+    """
+    now = datetime.utcnow()
+    rows = (
+        db.session.query(
+            Voicemail.id,
+            Voicemail.status,
+            Voicemail.version,
+            Voicemail.status_changed_at,
+            Voicemail.received_at
+        )
+        .filter(*filters)
+        .all()
+    )
+
+    moved = 0
+    for row in rows:
+        result = db.session.execute(
+            update(Voicemail)
+            .where(Voicemail.id == row.id, Voicemail.version == row.version)
+            .values(
+                status=new_status,
+                status_changed_at=now,
+                version=row.version + 1,
+                **values
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            # Changed since the SELECT: whoever changed it wins
+            continue
+
+        moved += 1
+        if row.status != new_status:
+            _buffer_status_event(
+                row.id, row.status, new_status, row.status_changed_at or row.received_at, now
+            )
+
+    return moved
+
+
+# Compare-and-swap pending status changes, then flush buffered status
+# events as one executemany per transaction
+@event.listens_for(db.session, "before_commit")
+def _write_voicemail_status(session):
+    pending = session.info.pop("voicemail_status_cas", None)
+
+    for voicemail_id, (voicemail, expected_version, columns) in (pending or {}).items():
+        values = {column: getattr(voicemail, column) for column in columns}
+
+        result = session.execute(
+            update(Voicemail)
+            .where(Voicemail.id == voicemail_id, Voicemail.version == expected_version)
+            .values(version=expected_version + 1, **values)
+            .execution_options(synchronize_session=False)
+        )
+
+        if result.rowcount != 1:
+            session.info.pop("voicemail_events", None)
+            raise StaleVoicemailState(
+                f"Voicemail {voicemail_id} changed concurrently "
+                f"(expected version {expected_version}, wanted status {values.get('status')})"
+            )
+
+        set_committed_value(voicemail, "version", expected_version + 1)
+
+    rows = session.info.pop("voicemail_events", None)
+    if rows:
+        session.execute(insert(VoicemailEvent), rows)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _drop_voicemail_events(session):
+    session.info.pop("voicemail_status_cas", None)
+    session.info.pop("voicemail_events", None)
@@ -1,69 +1,220 @@
 import json
 import os
-import boto3
-import email
-import requests
-from email import policy
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from email.parser import BytesParser
+from http.client import HTTPConnection, HTTPException, HTTPSConnection, RemoteDisconnected
+from urllib.parse import unquote_plus, urlsplit
 
-s3 = boto3.client("s3")
+# Cold-start budget: only stdlib modules are imported at load time.
+# boto3 is imported on first use, and the webhook is called with a
+# minimal http.client wrapper instead of requests/urllib3.
 
 WEBHOOK_URL = os.environ.get("INGEST_WEBHOOK_URL")
+AUDIO_BUCKET = os.environ.get("AUDIO_BUCKET", "voicecarepro-audio-prod")
+MAX_WORKERS = int(os.environ.get("INGEST_MAX_WORKERS", "4"))
+WEBHOOK_TIMEOUT = float(os.environ.get("INGEST_WEBHOOK_TIMEOUT", "20"))
+
+_s3 = None
+_s3_lock = threading.Lock()
+
+# One keep-alive connection per thread, reused across records and warm
+# invocations: records run on the main thread or on the long-lived
+# module-level pool below (threads, and so connections, outlive a call)
+_local = threading.local()
+
+# Created once per container; threads start lazily on first submit
+_record_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="record")
+
+
+def get_s3():
+    """Returns the shared S3 client, importing boto3 on first use."""
+    global _s3
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                import boto3
+                _s3 = boto3.client("s3")
+    return _s3
+
+
+def _get_connection(url):
+    parts = urlsplit(url)
+    conn = getattr(_local, "conn", None)
+
+    if conn is None or getattr(_local, "netloc", None) != parts.netloc:
+        conn_class = HTTPSConnection if parts.scheme == "https" else HTTPConnection
+        conn = conn_class(parts.netloc, timeout=WEBHOOK_TIMEOUT)
+        _local.conn = conn
+        _local.netloc = parts.netloc
+
+    return conn
+
+
+def post_json(url, payload):
+    """POSTs a JSON payload over a kept-alive connection. Returns (status, body)."""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+    # Retry once on a fresh connection, but only when a reused keep-alive
+    # connection turned out to be closed before any response: the server
+    # never processed the request. Timeouts and errors after the status
+    # line are not retried, the webhook may already have created the
+    # voicemails.
+    for attempt in range(2):
+        reused = getattr(_local, "conn", None) is not None
+        conn = _get_connection(url)
+        try:
+            conn.request("POST", path, body=body, headers=headers)
+            response = conn.getresponse()
+        except (RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            _local.conn = None
+            if attempt == 1 or not reused:
+                raise
+            continue
+        except (HTTPException, OSError):
+            conn.close()
+            _local.conn = None
+            raise
+
+        try:
+            return response.status, response.read().decode("utf-8", "replace")
+        except (HTTPException, OSError):
+            conn.close()
+            _local.conn = None
+            raise
+
+
+def process_record(record):
+    """Handles a single S3 record. Returns a per-record result dict."""
+    bucket = record["s3"]["bucket"]["name"]
+    key = unquote_plus(record["s3"]["object"]["key"])
+
+    result = {"bucket": bucket, "key": key}
 
-
-def lambda_handler(event, context):
     try:
-        # Get S3 bucket + object key from SES trigger
-        record = event["Records"][0]
-        bucket = record["s3"]["bucket"]["name"]
-        key = record["s3"]["object"]["key"]
+        s3 = get_s3()
 
         # Download raw email from S3
         response = s3.get_object(Bucket=bucket, Key=key)
         raw_email = response["Body"].read()
 
-        # Parse MIME email
-        msg = BytesParser(policy=policy.default).parsebytes(raw_email)
+        # Parse MIME email (compat32 policy: no header registry / charset work)
+        msg = BytesParser().parsebytes(raw_email)
 
         # Extract recipient (clinic token)
         recipient = msg["To"]
 
-        # Extract audio attachment
-        audio_file = None
-        audio_filename = None
+        # Extract every audio attachment (phone systems may bundle several)
+        attachments = []
 
-        for part in msg.iter_attachments():
+        for part in msg.walk():
             content_type = part.get_content_type()
             if content_type.startswith("audio/"):
-                audio_file = part.get_content()
-                audio_filename = part.get_filename()
-                break
-
-        if not audio_file:
-            print("No audio attachment found.")
-            return {"statusCode": 400, "body": "No audio attachment"}
-
-        # Send to Flask webhook
-        files = {
-            "file": (audio_filename, audio_file)
-        }
-
-        data = {
-            "recipient": recipient
+                audio_file = part.get_payload(decode=True)
+                if audio_file:
+                    attachments.append((part.get_filename(), content_type, audio_file))
+
+        if not attachments:
+            print(f"No audio attachment found in {key}.")
+            result.update(statusCode=400, body="No audio attachment")
+            return result
+
+        # Write audio straight into the audio bucket so the web app
+        # never has to download or re-upload the bytes. Keys derive from
+        # the email object, so a retried invocation overwrites the same
+        # objects instead of creating new ones.
+        def store_attachment(indexed):
+            index, (audio_filename, content_type, audio_file) = indexed
+            ext = audio_filename.split(".")[-1] if audio_filename else "mp3"
+            audio_key = f"voicemails/{uuid.uuid5(uuid.NAMESPACE_URL, f's3://{bucket}/{key}#{index}')}.{ext}"
+
+            s3.put_object(
+                Bucket=AUDIO_BUCKET,
+                Key=audio_key,
+                Body=audio_file,
+                ContentType=content_type
+            )
+
+            return {
+                "audio_key": audio_key,
+                "filename": audio_filename,
+                "content_type": content_type,
+                "size": len(audio_file)
+            }
+
+        if len(attachments) == 1:
+            stored = [store_attachment((0, attachments[0]))]
+        else:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(attachments))) as pool:
+                stored = list(pool.map(store_attachment, enumerate(attachments)))
+
+        # Notify Flask webhook with a small JSON reference
+        payload = {
+            "recipient": str(recipient) if recipient else None,
+            "attachments": stored
         }
 
-        response = requests.post(WEBHOOK_URL, files=files, data=data, timeout=20)
+        status, body = post_json(WEBHOOK_URL, payload)
+        ok = 200 <= status < 300
 
-        print("Webhook response:", response.status_code)
+        print(f"Webhook response for {key}:", status)
 
-        return {
-            "statusCode": 200,
-            "body": "Processed successfully"
-        }
+        # 4xx (unknown clinic token, empty audio) won't succeed on retry
+        result.update(
+            statusCode=200 if ok else status if 400 <= status < 500 else 502,
+            body="Processed successfully" if ok else body,
+            audio_keys=[a["audio_key"] for a in stored]
+        )
+        return result
 
     except Exception as e:
-        print("Error:", str(e))
-        return {
-            "statusCode": 500,
-            "body": str(e)
-        }
\ No newline at end of file
+        print(f"Error processing {key}:", str(e))
+        result.update(statusCode=500, body=str(e))
+        return result
+
+
+def lambda_handler(event, context):
+    records = event.get("Records", [])
+
+    if not records:
+        return {"statusCode": 400, "body": "No records"}
+
+    # Single record: skip the pool entirely
+    if len(records) == 1:
+        results = [process_record(records[0])]
+    else:
+        # Bounded pool: each record is mostly S3 + webhook I/O
+        results = list(_record_pool.map(process_record, records))
+
+    failed = [r for r in results if r["statusCode"] != 200]
+
+    # S3/SES invoke asynchronously and ignore the return value: raise so
+    # Lambda retries the event (and finally hands it to the DLQ) instead
+    # of dropping the record. Records that already went through are
+    # stored again under the same audio keys and deduped by the webhook.
+    retryable = [r for r in failed if r["statusCode"] >= 500]
+    if retryable:
+        raise RuntimeError(
+            f"{len(retryable)} of {len(results)} records failed: "
+            + ", ".join(f"{r['key']} ({r['body']})" for r in retryable)
+        )
+
+    if not failed:
+        status_code = 200
+    elif len(failed) == len(results):
+        status_code = 500
+    else:
+        status_code = 207
+
+    return {
+        "statusCode": status_code,
+        "body": json.dumps({"results": results})
+    }
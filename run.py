@@ -16,7 +16,9 @@ from flask import (
     redirect,
     url_for,
     flash,
-    jsonify
+    jsonify,
+    abort,
+    send_file
 )
 
 from flask_login import (
@@ -32,10 +34,29 @@ from services.digest_service import send_daily_digest
 from billing.plans import PLANS
 from utils.billing import get_clinic_usage_status
 from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
 
-from database import db, User, Voicemail, Clinic, TriageCard
+from database import db, User, Voicemail, Clinic, TriageCard, StaleVoicemailState
 from flask_migrate import Migrate
-from services.storage_service import upload_file
+from services.storage_service import (
+    upload_file,
+    generate_presigned_post,
+    invalidate_presigned_url,
+    get_object_info,
+    get_storage,
+    get_s3_client,
+    verify_local_signature,
+    LocalBackend
+)
+from services.clinic_cache import get_clinic_by_token
+from services.deepgram_callback import verify_callback, parse_callback
+from utils.audio_metadata import (
+    probe_bytes,
+    probe_fileobj,
+    probe_stored,
+    is_empty_audio,
+    audio_columns
+)
 
 # ------------------------
 # LOAD ENV
@@ -170,7 +191,7 @@ def run_ai_pipeline(v, file_path):
 
     for attempt in range(3):
         try:
-            v.update_status("transcribing")
+            v.advance("transcribing")
 
             result = processor.transcribe_audio(file_path)
             transcript = result.get("transcription")
@@ -179,10 +200,10 @@ def run_ai_pipeline(v, file_path):
             v.transcript = transcript
             v.transcription_confidence = confidence
 
-            v.update_status("extracting")
+            v.advance("extracting")
             patient_info = processor.extract_patient_info(transcript)
 
-            v.update_status("summarizing")
+            v.advance("summarizing")
             processor.summarize_and_triage(transcript, patient_info)
 
             v.update_status("completed")
@@ -297,6 +318,11 @@ def upload_voicemail():
     ext = os.path.splitext(file.filename)[1] if file.filename else ".mp3"
     filename = f"{uuid.uuid4()}{ext}"
 
+    # Header-only probe (duration / codec) before paying for storage
+    audio_info = probe_fileobj(file.stream)
+    if is_empty_audio(audio_info):
+        return jsonify({"error": "Audio file is empty"}), 400
+
     # Upload to storage
     s3_key = upload_file(file)  # make sure your upload_file supports custom filename
 
@@ -306,7 +332,8 @@ def upload_voicemail():
         audio_url=s3_key,
         source="clinic_upload",
         received_at=datetime.utcnow(),
-        status="received"
+        status="received",
+        **audio_columns(audio_info)
     )
 
     db.session.add(voicemail)
@@ -314,6 +341,93 @@ def upload_voicemail():
 
     return redirect(url_for("dashboard"))
 
+# ------------------------
+# DIRECT-TO-S3 UPLOAD (PRESIGNED POST)
+# ------------------------
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "16")) * 1024 * 1024
+ALLOWED_UPLOAD_EXTENSIONS = {".mp3", ".wav", ".m4a", ".ogg", ".flac", ".aac"}
+
+
+def clinic_upload_prefix(clinic_id):
+    return f"uploads/{clinic_id}/"
+
+
+@app.route("/upload/ticket", methods=["POST"])
+@login_required
+def upload_ticket():
+    """Issues a presigned POST so the browser uploads straight to S3."""
+    data = request.get_json() or {}
+
+    ext = os.path.splitext(data.get("filename") or "")[1].lower() or ".mp3"
+    content_type = data.get("content_type") or ""
+
+    if ext not in ALLOWED_UPLOAD_EXTENSIONS or not content_type.startswith("audio/"):
+        return jsonify({"error": "Unsupported file type"}), 400
+
+    try:
+        size = int(data.get("size") or 0)
+    except (TypeError, ValueError):
+        size = -1
+
+    if size < 0:
+        return jsonify({"error": "Invalid file size"}), 400
+
+    if size > MAX_UPLOAD_BYTES:
+        return jsonify({"error": "File too large"}), 400
+
+    s3_key = f"{clinic_upload_prefix(current_user.clinic_id)}{uuid.uuid4()}{ext}"
+    post = generate_presigned_post(s3_key, MAX_UPLOAD_BYTES)
+
+    if not post:
+        return jsonify({"error": "Direct upload not supported by storage backend"}), 501
+
+    return jsonify({"url": post["url"], "fields": post["fields"], "key": s3_key})
+
+
+@app.route("/upload/complete", methods=["POST"])
+@login_required
+def upload_complete():
+    """Creates the voicemail row once the browser finished uploading."""
+    data = request.get_json() or {}
+    s3_key = data.get("key") or ""
+
+    if not s3_key.startswith(clinic_upload_prefix(current_user.clinic_id)):
+        return jsonify({"error": "Invalid upload key"}), 400
+
+    if Voicemail.query.filter_by(audio_url=s3_key).first():
+        return jsonify({"error": "Upload already completed"}), 409
+
+    info = get_object_info(s3_key)
+    if not info:
+        return jsonify({"error": "Upload not found"}), 404
+
+    audio_info = probe_stored(get_storage(), s3_key, info["size"])
+    if is_empty_audio(audio_info):
+        get_storage().delete(s3_key)
+        invalidate_presigned_url(s3_key)
+        return jsonify({"error": "Audio file is empty"}), 400
+
+    voicemail = Voicemail(
+        clinic_id=current_user.clinic_id,
+        filename=s3_key.split("/")[-1],
+        audio_url=s3_key,
+        source="clinic_upload",
+        received_at=datetime.utcnow(),
+        status="received",
+        **audio_columns(audio_info)
+    )
+
+    db.session.add(voicemail)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent complete for the same key won the unique index
+        db.session.rollback()
+        return jsonify({"error": "Upload already completed"}), 409
+
+    return jsonify({"success": True, "voicemail_id": voicemail.id}), 201
+
 @app.route("/dashboard")
 @login_required
 def dashboard():
@@ -358,20 +472,94 @@ def dashboard():
 # STEP 8 — FLASK WEBHOOK ENDPOINT (UPDATED JSON VERSION)
 # ------------------------
 
-import boto3
 import email
 from email import policy
 from email.parser import BytesParser
+from email.utils import parseaddr
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+def get_ingest_token(recipient):
+    """Returns the clinic ingest token from a recipient address."""
+    address = parseaddr(str(recipient))[1] or str(recipient)
+    return address.split("@")[0].strip()
+
+
+def create_email_voicemails(clinic, stored_attachments):
+    """
+    Creates one voicemail per stored audio attachment in a single
+    flush (batched INSERT) and commit. Attachments that already have a
+    voicemail (a retried Lambda delivery) are skipped.
+    """
+    existing = {
+        v.audio_url: v.id
+        for v in Voicemail.query.filter(
+            Voicemail.audio_url.in_([a["audio_key"] for a in stored_attachments])
+        )
+    }
+    if existing:
+        logger.info(f"Skipping {len(existing)} already ingested audio attachments")
+        stored_attachments = [a for a in stored_attachments if a["audio_key"] not in existing]
+
+    # Zero-length audio never reaches the transcription provider
+    empty = [a for a in stored_attachments if is_empty_audio(a.get("audio_info"))]
+    for attachment in empty:
+        logger.warning(f"Rejecting empty audio attachment {attachment['audio_key']}")
+        get_storage().delete(attachment["audio_key"])
+        invalidate_presigned_url(attachment["audio_key"])
+
+    stored_attachments = [a for a in stored_attachments if a not in empty]
+    if not stored_attachments and not existing:
+        return jsonify({"error": "Audio attachment is empty"}), 400
+
+    voicemails = [
+        Voicemail(
+            clinic_id=clinic.id,
+            filename=attachment.get("filename") or attachment["audio_key"].split("/")[-1],
+            audio_url=attachment["audio_key"],
+            source="email_ingest",
+            received_at=datetime.utcnow(),
+            status="pending",
+            **audio_columns(attachment.get("audio_info"))
+        )
+        for attachment in stored_attachments
+    ]
+
+    db.session.add_all(voicemails)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent delivery of the same email inserted them first
+        db.session.rollback()
+        raced = Voicemail.query.filter(
+            Voicemail.audio_url.in_([a["audio_key"] for a in stored_attachments])
+        ).all()
+        if not raced:
+            raise
+        existing.update({v.audio_url: v.id for v in raced})
+        voicemails = []
+
+    ids = list(existing.values()) + [v.id for v in voicemails]
+    return jsonify({
+        "success": True,
+        "voicemail_id": ids[0],
+        "voicemail_ids": ids
+    }), 200
+
+
 @app.route("/webhooks/email-ingest", methods=["POST"], strict_slashes=False)
 def email_ingest():
     try:
-        s3 = boto3.client("s3")
-
         data = request.get_json()
 
+        # ✅ Fast path: Lambda already wrote the audio to the audio bucket
+        # and only sends us the references
+        if data.get("attachments") or data.get("audio_key"):
+            return ingest_audio_references(data)
+
+        storage = get_storage()
+
         bucket = data.get("bucket")
         key = data.get("key")
 
@@ -379,7 +567,7 @@ def email_ingest():
             return jsonify({"error": "Missing S3 data"}), 400
 
         # 1️⃣ Download raw email from S3
-        response = s3.get_object(Bucket=bucket, Key=key)
+        response = get_s3_client().get_object(Bucket=bucket, Key=key)
         raw_email = response["Body"].read()
 
         # 2️⃣ Parse MIME
@@ -390,53 +578,256 @@ def email_ingest():
         if not recipient:
             return jsonify({"error": "No recipient found"}), 400
 
-        token = recipient.split("@")[0].strip()
+        token = get_ingest_token(recipient)
 
-        clinic = Clinic.query.filter_by(ingest_email_token=token).first()
+        clinic = get_clinic_by_token(token)
         if not clinic:
             return jsonify({"error": "Invalid clinic token"}), 404
 
-        # 4️⃣ Extract audio attachment
-        audio_file = None
-        audio_filename = None
-
-        for part in msg.iter_attachments():
-            if part.get_content_type().startswith("audio/"):
-                audio_file = part.get_content()
-                audio_filename = part.get_filename()
-                break
+        # 4️⃣ Extract every audio attachment
+        attachments = [
+            (part.get_filename(), part.get_content_type(), part.get_content())
+            for part in msg.iter_attachments()
+            if part.get_content_type().startswith("audio/")
+        ]
 
-        if not audio_file:
+        if not attachments:
             return jsonify({"error": "No audio attachment found"}), 400
 
-        # 5️⃣ Save audio to S3 (voicemails folder)
-        ext = audio_filename.split(".")[-1] if audio_filename else "mp3"
-        filename = f"voicemails/{uuid.uuid4()}.{ext}"
+        # 5️⃣ Save audio to storage (voicemails folder), concurrently
+        def store_attachment(attachment):
+            audio_filename, content_type, audio_file = attachment
+            ext = audio_filename.split(".")[-1] if audio_filename else "mp3"
+            filename = f"voicemails/{uuid.uuid4()}.{ext}"
 
-        s3.put_object(
-            Bucket="voicecarepro-audio-prod",
-            Key=filename,
-            Body=audio_file
-        )
+            storage.put(filename, audio_file, content_type=content_type)
 
-        # 6️⃣ Create voicemail record
-        voicemail = Voicemail(
-            clinic_id=clinic.id,
-            filename=audio_filename,
-            audio_url=filename,
-            source="email_ingest",
-            received_at=datetime.utcnow(),
-            status="pending"
-        )
+            return {
+                "audio_key": filename,
+                "filename": audio_filename,
+                "audio_info": probe_bytes(audio_file)
+            }
 
-        db.session.add(voicemail)
-        db.session.commit()
+        with ThreadPoolExecutor(max_workers=min(4, len(attachments))) as pool:
+            stored = list(pool.map(store_attachment, attachments))
 
-        return jsonify({"success": True, "voicemail_id": voicemail.id}), 200
+        # 6️⃣ Create voicemail records
+        return create_email_voicemails(clinic, stored)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
+
+
+def ingest_audio_references(data):
+    """
+    Creates voicemails from audio the ingest Lambda already stored
+    in the audio bucket. No audio bytes pass through the web dyno.
+    """
+    recipient = data.get("recipient")
+
+    # Single-attachment payloads from older Lambda deployments
+    stored = data.get("attachments") or [
+        {"audio_key": data.get("audio_key"), "filename": data.get("filename")}
+    ]
+
+    if not recipient:
+        return jsonify({"error": "No recipient found"}), 400
+
+    if not all((a.get("audio_key") or "").startswith("voicemails/") for a in stored):
+        return jsonify({"error": "Invalid audio key"}), 400
+
+    token = get_ingest_token(recipient)
+
+    clinic = get_clinic_by_token(token)
+    if not clinic:
+        return jsonify({"error": "Invalid clinic token"}), 404
+
+    # Read only the container headers (ranged GETs) to get duration/codec
+    storage = get_storage()
+
+    def with_audio_info(attachment):
+        info = probe_stored(storage, attachment["audio_key"], attachment.get("size"))
+        return dict(attachment, audio_info=info)
+
+    with ThreadPoolExecutor(max_workers=min(4, len(stored))) as pool:
+        stored = list(pool.map(with_audio_info, stored))
+
+    return create_email_voicemails(clinic, stored)
+
+# ------------------------
+# DEEPGRAM CALLBACK WEBHOOK
+# ------------------------
+
+@app.route("/webhooks/deepgram/<int:voicemail_id>", methods=["POST"])
+def deepgram_callback(voicemail_id):
+    if not verify_callback(voicemail_id, request.args.get("sig")):
+        return jsonify({"error": "Invalid signature"}), 403
+
+    payload = request.get_json(silent=True) or {}
+    request_id, transcript, confidence = parse_callback(payload)
+
+    voicemail = db.session.get(Voicemail, voicemail_id)
+    if not voicemail:
+        return jsonify({"error": "Voicemail not found"}), 404
+
+    # Duplicate / late deliveries for a request we no longer wait on. No
+    # request id yet means the callback beat the worker's post-submit commit.
+    if (
+        voicemail.status != "awaiting_transcript"
+        or voicemail.transcription_request_id not in (None, request_id)
+    ):
+        logger.info(f"Ignoring Deepgram callback {request_id} for voicemail {voicemail_id}")
+        return jsonify({"status": "ignored"}), 200
+
+    try:
+        if transcript is None:
+            voicemail.update_status("failed", failure_reason="Deepgram callback returned no results")
+            return jsonify({"status": "failed"}), 200
+
+        voicemail.transcript = transcript
+        voicemail.transcription_confidence = confidence
+        voicemail.transcription_provider = "deepgram_v5"
+        voicemail.transcribed_at = datetime.utcnow()
+
+        # The worker picks "transcribed" voicemails up at extraction
+        voicemail.update_status("transcribed")
+    except StaleVoicemailState:
+        # Requeued or handled by a concurrent delivery meanwhile
+        db.session.rollback()
+        logger.info(f"Ignoring stale Deepgram callback {request_id} for voicemail {voicemail_id}")
+        return jsonify({"status": "ignored"}), 200
+
+    logger.info(f"📨 Deepgram callback stored transcript for voicemail {voicemail_id}")
+    return jsonify({"status": "ok"}), 200
+
+# ------------------------
+# AUDIO PLAYBACK (RANGE + CONDITIONAL GET)
+# ------------------------
+
+AUDIO_CACHE_MAX_AGE = int(os.getenv("AUDIO_CACHE_MAX_AGE", "3600"))
+
+
+@app.route("/voicemails/<int:voicemail_id>/audio")
+@login_required
+def voicemail_audio(voicemail_id):
+    """
+    Streams voicemail audio with Range support so browser seeking only
+    fetches the bytes it needs, and ETag/Last-Modified so repeat plays
+    are answered from the browser cache (304).
+    """
+    voicemail = Voicemail.query.get_or_404(voicemail_id)
+
+    if voicemail.clinic_id != current_user.clinic_id and not current_user.is_system_admin():
+        abort(404)
+
+    if not voicemail.audio_url:
+        abort(404)
+
+    storage = get_storage()
+    key = voicemail.audio_url
+
+    # Multi-range requests aren't supported: ignore the Range header and
+    # send the full body (RFC 9110 allows this) instead of a 416
+    single_range = request.range if request.range and len(request.range.ranges) == 1 else None
+    if request.range and not single_range:
+        request.environ.pop("HTTP_RANGE", None)
+
+    # Local files: werkzeug handles Range / conditional / sendfile
+    if isinstance(storage, LocalBackend):
+        try:
+            path = storage.path_for(key)
+        except ValueError:
+            abort(404)
+        if not os.path.exists(path):
+            abort(404)
+        response = send_file(path, conditional=True, etag=True)
+        response.cache_control.private = True
+        response.cache_control.max_age = AUDIO_CACHE_MAX_AGE
+        return response
+
+    info = storage.head(key)
+    if not info:
+        abort(404)
+
+    size = info["size"]
+    etag = info["etag"]
+    last_modified = info["last_modified"]
+
+    # Conditional GET
+    not_modified = (
+        request.if_none_match.contains(etag)
+        if request.if_none_match
+        else bool(request.if_modified_since and last_modified
+                  and last_modified.replace(microsecond=0) <= request.if_modified_since)
+    )
+
+    headers = {"Accept-Ranges": "bytes"}
+
+    if not_modified:
+        response = app.response_class(status=304, headers=headers)
+    else:
+        byte_range = None
+
+        # If-Range: only honour Range when the client's copy is current
+        if_range = request.if_range
+        range_is_current = (
+            (if_range.etag is None and if_range.date is None)
+            or if_range.etag == etag
+            or bool(if_range.date and last_modified
+                    and last_modified.replace(microsecond=0) <= if_range.date)
+        )
+
+        if single_range and range_is_current:
+            byte_range = single_range.range_for_length(size)
+            if byte_range is None:
+                headers["Content-Range"] = f"bytes */{size}"
+                return app.response_class(status=416, headers=headers)
+
+        start, stop = byte_range or (0, size)
+
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+
+        headers["Content-Length"] = str(stop - start)
+
+        response = app.response_class(
+            storage.stream(key, start if byte_range else None, stop - 1 if byte_range else None),
+            status=206 if byte_range else 200,
+            mimetype=info["content_type"] or "audio/mpeg",
+            headers=headers,
+            direct_passthrough=True
+        )
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.max_age = AUDIO_CACHE_MAX_AGE
+    return response
+
+# ------------------------
+# LOCAL STORAGE MEDIA (STORAGE_BACKEND=local)
+# Serves LocalBackend presigned URLs so the pipeline runs on one machine
+# ------------------------
+
+@app.route("/media/<path:key>")
+def local_media(key):
+    storage = get_storage()
+    if not isinstance(storage, LocalBackend):
+        abort(404)
+
+    if not verify_local_signature(key, request.args.get("expires"), request.args.get("signature")):
+        abort(403)
+
+    try:
+        path = storage.path_for(key)
+    except ValueError:
+        abort(404)
+
+    if not os.path.exists(path):
+        abort(404)
+
+    return send_file(path, conditional=True)
+
 # ------------------------
 # DEBUG TOKEN ROUTE
 # ------------------------
@@ -0,0 +1,82 @@
+import os
+import logging
+from collections import namedtuple
+
+from services.storage_service import get_storage
+from utils.audio_signal import (
+    can_decode,
+    decode_pcm,
+    duration_seconds,
+    trim_silence,
+    resample,
+    encode_audio
+)
+
+logger = logging.getLogger(__name__)
+
+# Off by default: the original is sent to the provider unchanged
+AUDIO_PREPROCESSING_ENABLED = os.getenv("AUDIO_PREPROCESSING_ENABLED", "false").lower() == "true"
+
+# 16 kHz mono is what speech models are trained on; more is billed, not heard
+PREPROCESS_SAMPLE_RATE = int(os.getenv("PREPROCESS_SAMPLE_RATE", "16000"))
+PREPROCESS_PADDING_MS = int(os.getenv("PREPROCESS_PADDING_MS", "250"))
+
+# Keep the processed copy only if it trims at least this much audio or is smaller
+PREPROCESS_MIN_SAVED_SECONDS = float(os.getenv("PREPROCESS_MIN_SAVED_SECONDS", "1"))
+
+PREPROCESS_MAX_BYTES = int(os.getenv("PREPROCESS_MAX_BYTES", str(50 * 1024 * 1024)))
+
+PreprocessResult = namedtuple("PreprocessResult", ["key", "bytes_saved", "seconds_saved"])
+
+
+def processed_key_for(audio_key, extension):
+    """voicemails/abc.mp3 -> voicemails/abc.processed.flac"""
+    base, _ = os.path.splitext(audio_key)
+    return f"{base}.processed.{extension}"
+
+
+def preprocess_voicemail(voicemail, storage=None):
+    """
+    Trims leading/trailing silence and downsamples to mono
+    PREPROCESS_SAMPLE_RATE, storing the result next to the original.
+    Returns PreprocessResult, or None when disabled, undecodable,
+    or not worth it. Never raises.
+    """
+    if not AUDIO_PREPROCESSING_ENABLED or not voicemail.audio_url:
+        return None
+
+    storage = storage or get_storage()
+
+    try:
+        info = storage.head(voicemail.audio_url)
+        if not info or info["size"] > PREPROCESS_MAX_BYTES:
+            return None
+
+        if not can_decode(voicemail.audio_url, voicemail.audio_codec, info.get("content_type")):
+            return None
+
+        original = storage.get(voicemail.audio_url)
+        pcm = decode_pcm(original, sample_rate=PREPROCESS_SAMPLE_RATE)
+        if pcm is None:
+            return None
+
+        original_seconds = duration_seconds(pcm)
+        pcm = trim_silence(pcm, padding_ms=PREPROCESS_PADDING_MS)
+        pcm = resample(pcm, PREPROCESS_SAMPLE_RATE)
+
+        data, extension, content_type = encode_audio(pcm)
+        seconds_saved = original_seconds - duration_seconds(pcm)
+        bytes_saved = len(original) - len(data)
+
+        if seconds_saved < PREPROCESS_MIN_SAVED_SECONDS and bytes_saved <= 0:
+            logger.info(f"Preprocessing not worth it for voicemail {voicemail.id}")
+            return None
+
+        key = processed_key_for(voicemail.audio_url, extension)
+        storage.put(key, data, content_type=content_type)
+    except Exception as e:
+        # Fall back to the original audio
+        logger.warning(f"Preprocessing skipped for voicemail {voicemail.id}: {e}")
+        return None
+
+    return PreprocessResult(key, bytes_saved, round(seconds_saved, 2))
@@ -0,0 +1,66 @@
+import os
+import logging
+from collections import namedtuple
+
+from services.storage_service import get_storage
+from utils.audio_signal import can_decode, decode_pcm, duration_seconds, voiced_seconds
+
+logger = logging.getLogger(__name__)
+
+# Anything shorter than this (from the container header) is a hang-up
+MIN_VOICEMAIL_SECONDS = float(os.getenv("MIN_VOICEMAIL_SECONDS", "2"))
+
+# Less audible audio than this (energy above the silence floor) is line noise
+MIN_SPEECH_SECONDS = float(os.getenv("MIN_SPEECH_SECONDS", "1"))
+
+# Only short files are downloaded for the energy check; long recordings
+# are practically never empty and are left to the provider
+SILENCE_CHECK_MAX_SECONDS = float(os.getenv("SILENCE_CHECK_MAX_SECONDS", "60"))
+SILENCE_CHECK_MAX_BYTES = int(os.getenv("SILENCE_CHECK_MAX_BYTES", str(5 * 1024 * 1024)))
+
+ScreeningResult = namedtuple("ScreeningResult", ["is_empty", "reason", "voiced_seconds"])
+
+NOT_EMPTY = ScreeningResult(False, None, None)
+
+
+def screen_voicemail(voicemail, storage=None):
+    """
+    Cheap local check run before any provider call.
+    Returns ScreeningResult(is_empty, reason, voiced_seconds).
+    """
+    duration = voicemail.audio_duration
+
+    if duration is not None and duration < MIN_VOICEMAIL_SECONDS:
+        return ScreeningResult(True, f"too short ({duration}s)", None)
+
+    if duration is not None and duration > SILENCE_CHECK_MAX_SECONDS:
+        return NOT_EMPTY
+
+    storage = storage or get_storage()
+
+    try:
+        info = storage.head(voicemail.audio_url)
+        if not info or info["size"] > SILENCE_CHECK_MAX_BYTES:
+            return NOT_EMPTY
+
+        # No point downloading audio we can't decode (MP3/M4A without ffmpeg)
+        if not can_decode(voicemail.audio_url, voicemail.audio_codec, info.get("content_type")):
+            return NOT_EMPTY
+
+        pcm = decode_pcm(storage.get(voicemail.audio_url))
+    except Exception as e:
+        # Screening must never block the real pipeline
+        logger.warning(f"Silence check skipped for voicemail {voicemail.id}: {e}")
+        return NOT_EMPTY
+
+    if pcm is None:
+        return NOT_EMPTY
+
+    if duration_seconds(pcm) < MIN_VOICEMAIL_SECONDS:
+        return ScreeningResult(True, f"too short ({duration_seconds(pcm):.1f}s)", None)
+
+    voiced = voiced_seconds(pcm)
+    if voiced < MIN_SPEECH_SECONDS:
+        return ScreeningResult(True, f"silence ({voiced:.1f}s above noise floor)", voiced)
+
+    return ScreeningResult(False, None, voiced)
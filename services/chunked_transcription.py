@@ -0,0 +1,84 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from services.storage_service import get_storage
+from utils.audio_signal import can_decode, decode_pcm, duration_seconds, split_on_silence, encode_audio
+
+logger = logging.getLogger(__name__)
+
+# Only recordings longer than this are split; short ones go in one request
+CHUNKED_TRANSCRIPTION_MIN_SECONDS = float(os.getenv("CHUNKED_TRANSCRIPTION_MIN_SECONDS", "120"))
+
+CHUNK_TARGET_SECONDS = float(os.getenv("CHUNK_TARGET_SECONDS", "45"))
+CHUNK_MAX_SECONDS = float(os.getenv("CHUNK_MAX_SECONDS", "75"))
+CHUNK_TRANSCRIPTION_WORKERS = int(os.getenv("CHUNK_TRANSCRIPTION_WORKERS", "4"))
+
+CHUNK_DECODE_RATE = 16000
+
+
+def transcription_seconds(voicemail):
+    """Header duration minus anything preprocessing trimmed, or None."""
+    if voicemail.audio_duration is None:
+        return None
+    return voicemail.audio_duration - (voicemail.preprocess_seconds_saved or 0)
+
+
+def merge_chunk_results(results):
+    """
+    Stitches [(transcript, confidence, seconds), ...] in order.
+    Confidence is the duration-weighted mean over chunks that reported one.
+    """
+    transcript = " ".join(text.strip() for text, _, _ in results if text and text.strip())
+
+    weighted = [(conf, seconds) for _, conf, seconds in results if conf is not None]
+    total = sum(seconds for _, seconds in weighted)
+    confidence = sum(conf * seconds for conf, seconds in weighted) / total if total else None
+
+    return transcript, confidence
+
+
+def transcribe_chunked(ai_processor, voicemail, storage=None):
+    """
+    Splits long audio on pauses and transcribes the chunks concurrently.
+    Returns (transcript, confidence), or None when the recording is short
+    or can't be decoded here — the caller then transcribes it whole.
+    """
+    seconds = transcription_seconds(voicemail)
+    if seconds is None or seconds < CHUNKED_TRANSCRIPTION_MIN_SECONDS:
+        return None
+
+    key = voicemail.processed_audio_url or voicemail.audio_url
+
+    # The probed codec describes the original, not the processed copy
+    codec = None if voicemail.processed_audio_url else voicemail.audio_codec
+    if not can_decode(key, codec):
+        logger.info(f"Can't decode voicemail {voicemail.id} locally, transcribing whole")
+        return None
+
+    storage = storage or get_storage()
+
+    pcm = decode_pcm(storage.get(key), sample_rate=CHUNK_DECODE_RATE)
+    if pcm is None:
+        logger.info(f"Can't decode voicemail {voicemail.id} locally, transcribing whole")
+        return None
+
+    chunks = split_on_silence(pcm, CHUNK_TARGET_SECONDS, CHUNK_MAX_SECONDS)
+    if len(chunks) == 1:
+        return None
+
+    logger.info(
+        f"✂️ Voicemail {voicemail.id}: {duration_seconds(pcm):.0f}s split into "
+        f"{len(chunks)} chunks"
+    )
+
+    def transcribe(chunk):
+        data, _, content_type = encode_audio(chunk)
+        transcript, confidence = ai_processor.transcribe_audio_bytes(data, content_type)
+        return transcript, confidence, duration_seconds(chunk)
+
+    # map() keeps input order; the first chunk failure propagates
+    with ThreadPoolExecutor(max_workers=min(CHUNK_TRANSCRIPTION_WORKERS, len(chunks))) as pool:
+        results = list(pool.map(transcribe, chunks))
+
+    return merge_chunk_results(results)
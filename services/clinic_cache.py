@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event
+
+from database import Clinic
+
+logger = logging.getLogger(__name__)
+
+CLINIC_CACHE_TTL = float(os.getenv("CLINIC_CACHE_TTL", "60"))
+CLINIC_CACHE_SIZE = int(os.getenv("CLINIC_CACHE_SIZE", "1024"))
+
+# Routing metadata only — never hand out ORM objects across requests
+ClinicRoute = namedtuple(
+    "ClinicRoute",
+    ["id", "name", "email", "plan_name", "is_active", "ingest_email_token", "pipeline_stages"]
+)
+
+
+class _TTLCache:
+    """Small thread-safe LRU cache with a per-entry TTL."""
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_by_id = _TTLCache(CLINIC_CACHE_TTL, CLINIC_CACHE_SIZE)
+_token_to_id = _TTLCache(CLINIC_CACHE_TTL, CLINIC_CACHE_SIZE)
+
+
+def _to_route(clinic):
+    return ClinicRoute(
+        id=clinic.id,
+        name=clinic.name,
+        email=clinic.email,
+        plan_name=clinic.plan_name,
+        is_active=clinic.is_active,
+        ingest_email_token=clinic.ingest_email_token,
+        pipeline_stages=tuple(clinic.pipeline_stages) if clinic.pipeline_stages else None
+    )
+
+
+def _remember(clinic):
+    route = _to_route(clinic)
+    _by_id.set(route.id, route)
+    _token_to_id.set(route.ingest_email_token, route.id)
+    return route
+
+
+def get_clinic_by_token(token):
+    """
+    Returns ClinicRoute for an ingest token, or None.
+    Unknown tokens are not cached so new clinics work immediately.
+    """
+    clinic_id = _token_to_id.get(token)
+    if clinic_id is not None:
+        route = _by_id.get(clinic_id)
+        if route is not None and route.ingest_email_token == token:
+            return route
+
+    clinic = Clinic.query.filter_by(ingest_email_token=token).first()
+    if not clinic:
+        return None
+
+    return _remember(clinic)
+
+
+def get_clinic_route(clinic_id):
+    """Returns ClinicRoute for a clinic id, or None."""
+    route = _by_id.get(clinic_id)
+    if route is not None:
+        return route
+
+    clinic = Clinic.query.get(clinic_id)
+    if not clinic:
+        return None
+
+    return _remember(clinic)
+
+
+def invalidate_clinic(clinic_id, token=None):
+    """Drops a clinic from this process's cache."""
+    route = _by_id.get(clinic_id)
+    _by_id.pop(clinic_id)
+
+    if route is not None:
+        _token_to_id.pop(route.ingest_email_token)
+    if token:
+        _token_to_id.pop(token)
+
+
+def clear_clinic_cache():
+    _by_id.clear()
+    _token_to_id.clear()
+
+
+# ------------------------
+# Invalidate on any ORM update/delete in this process.
+# Other processes pick up the change within CLINIC_CACHE_TTL.
+# ------------------------
+
+@event.listens_for(Clinic, "after_update")
+@event.listens_for(Clinic, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    logger.debug(f"Invalidating cached clinic {target.id}")
+    invalidate_clinic(target.id, target.ingest_email_token)
@@ -0,0 +1,76 @@
+import os
+import hmac
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from database import db, Voicemail, bulk_update_status
+
+logger = logging.getLogger(__name__)
+
+# Off by default: the worker waits for Deepgram synchronously
+DEEPGRAM_CALLBACK_ENABLED = os.getenv("DEEPGRAM_CALLBACK_ENABLED", "false").lower() == "true"
+
+# Public base URL Deepgram can reach, e.g. https://app.voicecarepro.com
+DEEPGRAM_CALLBACK_BASE_URL = os.getenv("DEEPGRAM_CALLBACK_BASE_URL", "").rstrip("/")
+
+# Resubmit if no callback arrived within this long
+DEEPGRAM_CALLBACK_TIMEOUT = int(os.getenv("DEEPGRAM_CALLBACK_TIMEOUT", "900"))
+
+
+def callback_enabled():
+    return DEEPGRAM_CALLBACK_ENABLED and bool(DEEPGRAM_CALLBACK_BASE_URL)
+
+
+def sign_callback(voicemail_id):
+    secret = (os.getenv("SECRET_KEY") or "").encode()
+    message = f"deepgram-callback:{voicemail_id}".encode()
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+def verify_callback(voicemail_id, signature):
+    return hmac.compare_digest(sign_callback(voicemail_id), signature or "")
+
+
+def callback_url_for(voicemail_id):
+    return (
+        f"{DEEPGRAM_CALLBACK_BASE_URL}/webhooks/deepgram/{voicemail_id}"
+        f"?sig={sign_callback(voicemail_id)}"
+    )
+
+
+def parse_callback(payload):
+    """
+    Returns (request_id, transcript, confidence) from a Deepgram callback
+    body. transcript is None if the body carries no results (error callback).
+    """
+    request_id = (payload.get("metadata") or {}).get("request_id")
+
+    try:
+        alternative = payload["results"]["channels"][0]["alternatives"][0]
+    except (KeyError, IndexError, TypeError):
+        return request_id, None, None
+
+    return request_id, alternative.get("transcript", ""), alternative.get("confidence")
+
+
+def requeue_stale_callbacks():
+    """
+    Puts voicemails whose callback never arrived back in the queue.
+    Returns the number requeued.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=DEEPGRAM_CALLBACK_TIMEOUT)
+
+    requeued = bulk_update_status(
+        (
+            Voicemail.status == "awaiting_transcript",
+            Voicemail.transcription_submitted_at < cutoff
+        ),
+        "received",
+        transcription_request_id=None
+    )
+    db.session.commit()
+
+    if requeued:
+        logger.warning(f"Requeued {requeued} voicemails with no Deepgram callback")
+    return requeued
@@ -0,0 +1,462 @@
+import os
+import json
+import uuid
+import logging
+from datetime import datetime
+from collections import namedtuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import update
+
+from database import db, Voicemail, LLMBatch, StaleVoicemailState, bulk_update_status
+from utils.ai_processor import (
+    extraction_request,
+    extraction_result,
+    triage_request,
+    triage_result,
+    apply_analysis_results
+)
+from utils.classifier import classify_intent
+from services.notification_service import send_clinic_notification
+from services.clinic_cache import get_clinic_route
+from services.triage_cards import triage_card_values, upsert_triage_cards
+from services.triage_service import (
+    detect_crisis,
+    crisis_request,
+    crisis_result,
+    keyword_analysis,
+    to_analysis
+)
+from billing.pipeline import get_pipeline_stages
+
+logger = logging.getLogger(__name__)
+
+# Off by default: every voicemail is triaged in real time
+DEFERRED_LANE_ENABLED = os.getenv("DEFERRED_LANE_ENABLED", "false").lower() == "true"
+
+# Outside these hours (clinic-local), non-urgent voicemails wait for the batch
+CLINIC_TIMEZONE = os.getenv("CLINIC_TIMEZONE", "America/New_York")
+BUSINESS_HOURS_START = int(os.getenv("BUSINESS_HOURS_START", "8"))
+BUSINESS_HOURS_END = int(os.getenv("BUSINESS_HOURS_END", "18"))
+
+LLM_BATCH_BACKEND = os.getenv("LLM_BATCH_BACKEND", "openai")
+LLM_BATCH_MAX_VOICEMAILS = int(os.getenv("LLM_BATCH_MAX_VOICEMAILS", "1000"))
+LLM_BATCH_SUBMIT_MINUTES = int(os.getenv("LLM_BATCH_SUBMIT_MINUTES", "60"))
+LLM_BATCH_POLL_MINUTES = int(os.getenv("LLM_BATCH_POLL_MINUTES", "10"))
+
+# poll() result: state is "in_progress", "completed" or "failed";
+# results maps custom_id -> completion text (None if that request failed)
+BatchPoll = namedtuple("BatchPoll", ["state", "results", "error"])
+
+# Pipeline stages the lane runs as batch requests
+BATCH_STAGES = ("extraction", "triage", "crisis_review")
+
+
+# ------------------------
+# Deferral policy
+# ------------------------
+
+def is_after_hours(now=None):
+    now = now or datetime.now(ZoneInfo(CLINIC_TIMEZONE))
+    if now.weekday() >= 5:
+        return True
+    return not (BUSINESS_HOURS_START <= now.hour < BUSINESS_HOURS_END)
+
+
+def should_defer(voicemail, now=None):
+    """
+    True for after-hours voicemails with no urgency signal that haven't
+    already been through the batch lane once. Always False unless this
+    process runs the lane jobs (start_lane_scheduler).
+    """
+    if not lane_running():
+        return False
+
+    if voicemail.llm_batch_id is not None or voicemail.skip_deferral:
+        return False
+
+    if not is_after_hours(now):
+        return False
+
+    # Nothing the lane would make cheaper
+    if not _stages(voicemail).intersection(BATCH_STAGES):
+        return False
+
+    transcript = voicemail.transcript or ""
+    return not detect_crisis(transcript) and classify_intent(transcript) != "emergency"
+
+
+# ------------------------
+# Batch clients
+# ------------------------
+
+class OpenAIBatchClient:
+    """OpenAI Batch API (/v1/chat/completions, 24h window, ~half price)."""
+
+    name = "openai"
+
+    def __init__(self):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def submit(self, requests):
+        """requests: [(custom_id, chat.completions kwargs)]. Returns batch id."""
+        lines = "\n".join(
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            })
+            for custom_id, body in requests
+        )
+
+        input_file = self.client.files.create(
+            file=("voicemail-triage.jsonl", lines.encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def poll(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+
+        if batch.status in ("failed", "expired", "cancelled"):
+            return BatchPoll("failed", None, f"batch {batch.status}")
+        if batch.status != "completed":
+            return BatchPoll("in_progress", None, None)
+
+        results = {}
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                body = (row.get("response") or {}).get("body") or {}
+                choices = body.get("choices") or []
+                results[row["custom_id"]] = choices[0]["message"]["content"] if choices else None
+
+        return BatchPoll("completed", results, None)
+
+
+class LocalBatchClient:
+    """
+    In-process stand-in for tests and development. Requests are answered
+    on the first poll by responder(body) -> completion text; the default
+    responder makes a normal real-time call.
+    """
+
+    name = "local"
+
+    _pending = {}
+
+    def __init__(self, responder=None):
+        self.responder = responder or self._realtime
+
+    @staticmethod
+    def _realtime(body):
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return client.chat.completions.create(**body).choices[0].message.content
+
+    def submit(self, requests):
+        batch_id = f"local-{uuid.uuid4().hex}"
+        self._pending[batch_id] = list(requests)
+        return batch_id
+
+    def poll(self, batch_id):
+        requests = self._pending.pop(batch_id, None)
+        if requests is None:
+            return BatchPoll("failed", None, "unknown local batch")
+
+        results = {}
+        for custom_id, body in requests:
+            try:
+                results[custom_id] = self.responder(body)
+            except Exception as e:
+                logger.warning(f"Local batch request {custom_id} failed: {e}")
+                results[custom_id] = None
+
+        return BatchPoll("completed", results, None)
+
+
+def get_batch_client():
+    if LLM_BATCH_BACKEND == "local":
+        return LocalBatchClient()
+    return OpenAIBatchClient()
+
+
+def _custom_id(voicemail_id, stage):
+    return f"vm-{voicemail_id}-{stage}"
+
+
+def _stages(voicemail):
+    return get_pipeline_stages(get_clinic_route(voicemail.clinic_id))
+
+
+def _batch_requests(voicemail):
+    """One request per batchable stage the clinic's plan includes."""
+    stages = _stages(voicemail)
+    transcript = voicemail.transcript
+    requests = []
+
+    if "extraction" in stages:
+        requests.append((_custom_id(voicemail.id, "extraction"), extraction_request(transcript)))
+
+    # Extraction and triage share a batch, so triage runs without patient info
+    if "triage" in stages:
+        requests.append((
+            _custom_id(voicemail.id, "triage"),
+            triage_request(transcript, None, routing="department_routing" in stages)
+        ))
+
+    if "crisis_review" in stages:
+        requests.append((_custom_id(voicemail.id, "crisis_review"), crisis_request(transcript)))
+
+    return requests
+
+
+def _batch_analysis(voicemail, stages, results):
+    """Batch completions -> the same results dict the worker's stage graph returns."""
+    def raw(stage):
+        return results.get(_custom_id(voicemail.id, stage))
+
+    analysis = {}
+    if "extraction" in stages:
+        analysis["extraction"] = extraction_result(raw("extraction"))
+    if "triage" in stages:
+        analysis["triage"] = triage_result(raw("triage"), routing="department_routing" in stages)
+    if "crisis_review" in stages:
+        transcript = voicemail.transcript or ""
+        analysis["crisis_review"] = (
+            to_analysis(crisis_result(raw("crisis_review"), transcript))
+            or keyword_analysis(transcript)
+        )
+    return analysis
+
+
+# ------------------------
+# Lane jobs (run by start_lane_scheduler)
+# ------------------------
+
+def submit_deferred_batch(client=None):
+    """
+    Submits all deferred, not-yet-batched voicemails. Returns the LLMBatch or None.
+
+    Every worker runs this job, so rows are claimed first: the new
+    LLMBatch id is the claim token, set with UPDATE ... WHERE
+    llm_batch_id IS NULL and committed before anything is sent. Only
+    the rows this call won are submitted.
+    """
+    candidate_ids = [
+        voicemail_id for (voicemail_id,) in
+        db.session.query(Voicemail.id)
+        .filter(Voicemail.status == "deferred", Voicemail.llm_batch_id.is_(None))
+        .order_by(Voicemail.id.asc())
+        .limit(LLM_BATCH_MAX_VOICEMAILS)
+    ]
+    if not candidate_ids:
+        return None
+
+    client = client or get_batch_client()
+
+    batch = LLMBatch(provider=client.name, status="claiming")
+    db.session.add(batch)
+    db.session.flush()
+
+    db.session.execute(
+        update(Voicemail)
+        .where(
+            Voicemail.id.in_(candidate_ids),
+            Voicemail.status == "deferred",
+            Voicemail.llm_batch_id.is_(None)
+        )
+        .values(llm_batch_id=batch.id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    voicemails = Voicemail.query.filter_by(llm_batch_id=batch.id).order_by(Voicemail.id.asc()).all()
+    if not voicemails:
+        # Another worker claimed them all first
+        db.session.delete(batch)
+        db.session.commit()
+        return None
+
+    requests = [request for v in voicemails for request in _batch_requests(v)]
+
+    try:
+        provider_batch_id = client.submit(requests)
+    except Exception:
+        # Release the claim so the next run picks them up again
+        db.session.execute(
+            update(Voicemail)
+            .where(Voicemail.llm_batch_id == batch.id)
+            .values(llm_batch_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.delete(batch)
+        db.session.commit()
+        raise
+
+    batch.provider_batch_id = provider_batch_id
+    batch.request_count = len(requests)
+    batch.status = "submitted"
+    batch.submitted_at = datetime.utcnow()
+    db.session.commit()
+
+    logger.info(f"📦 Submitted LLM batch {batch.id} ({provider_batch_id}) with {len(requests)} voicemails")
+    return batch
+
+
+def _apply_results(batch, results):
+    voicemails = Voicemail.query.filter_by(llm_batch_id=batch.id, status="deferred").all()
+
+    cards = []
+    for voicemail in voicemails:
+        stages = _stages(voicemail)
+        analysis = _batch_analysis(voicemail, stages, results)
+
+        final_status, crisis_flag = apply_analysis_results(
+            voicemail, analysis, routing="department_routing" in stages
+        )
+        voicemail.update_status(final_status, commit=False)
+
+        if "triage_card" in stages:
+            cards.append(triage_card_values(voicemail, crisis_flag))
+
+    # One batched upsert for the whole batch
+    upsert_triage_cards(cards)
+
+    batch.status = "completed"
+    batch.completed_at = datetime.utcnow()
+    db.session.commit()
+
+    for voicemail in voicemails:
+        if "notification" in _stages(voicemail):
+            send_clinic_notification(voicemail)
+
+    logger.info(f"✅ LLM batch {batch.id} written back: {len(voicemails)} voicemails")
+
+
+def _requeue(batch, status, error=None):
+    """Hands a batch's voicemails back to the real-time worker."""
+    bulk_update_status(
+        (Voicemail.llm_batch_id == batch.id, Voicemail.status == "deferred"),
+        "transcribed"
+    )
+    batch.status = status
+    batch.error_message = error
+    batch.completed_at = datetime.utcnow()
+    db.session.commit()
+    logger.warning(f"⚠️ LLM batch {batch.id} {status}, voicemails requeued for real-time triage")
+
+
+def poll_batches(client=None):
+    """Writes back every finished batch; returns how many finished."""
+    batches = LLMBatch.query.filter_by(status="submitted").all()
+    if not batches:
+        return 0
+
+    client = client or get_batch_client()
+    finished = 0
+
+    for batch in batches:
+        try:
+            poll = client.poll(batch.provider_batch_id)
+        except Exception as e:
+            logger.error(f"❌ Polling LLM batch {batch.id} failed: {e}")
+            continue
+
+        if poll.state == "in_progress":
+            continue
+
+        if poll.state == "failed":
+            _requeue(batch, "failed", poll.error)
+        else:
+            try:
+                _apply_results(batch, poll.results)
+            except StaleVoicemailState as e:
+                # Retried on the next poll without the voicemail that moved on
+                db.session.rollback()
+                logger.warning(f"⚠️ LLM batch {batch.id} write-back raced: {e}")
+                continue
+        finished += 1
+
+    return finished
+
+
+def finalize_before_digest(client=None):
+    """
+    Last poll before the daily digest. Anything still outstanding goes
+    back to the real-time worker so the digest isn't missing voicemails.
+    """
+    poll_batches(client)
+
+    # "claiming": the worker died between claiming rows and submitting
+    for batch in LLMBatch.query.filter(LLMBatch.status.in_(("submitted", "claiming"))).all():
+        _requeue(batch, "abandoned", "not finished before digest")
+
+    requeued = bulk_update_status(
+        (Voicemail.status == "deferred", Voicemail.llm_batch_id.is_(None)),
+        "transcribed",
+        skip_deferral=True
+    )
+    db.session.commit()
+
+    if requeued:
+        logger.info(f"Requeued {requeued} unsubmitted deferred voicemails before digest")
+
+
+# ------------------------
+# Lane runner
+# ------------------------
+
+_lane_scheduler = None
+
+
+def _lane_job(app, func):
+    def run():
+        with app.app_context():
+            try:
+                func()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"❌ LLM batch job {func.__name__} failed: {e}", exc_info=True)
+    return run
+
+
+def start_lane_scheduler(app):
+    """
+    Runs submit / poll / finalize in this process (the transcription
+    worker, which is the one deferring voicemails). Run it in a single
+    worker process. No-op unless DEFERRED_LANE_ENABLED.
+    """
+    global _lane_scheduler
+    if not DEFERRED_LANE_ENABLED or _lane_scheduler is not None:
+        return _lane_scheduler
+
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    scheduler = BackgroundScheduler()
+    jobs = (
+        (submit_deferred_batch, {"trigger": "interval", "minutes": LLM_BATCH_SUBMIT_MINUTES}),
+        (poll_batches, {"trigger": "interval", "minutes": LLM_BATCH_POLL_MINUTES}),
+        # Write back (or hand to the real-time worker) before the digest
+        (finalize_before_digest, {"trigger": "cron", "hour": 16, "minute": 30}),
+    )
+    for func, schedule in jobs:
+        scheduler.add_job(_lane_job(app, func), name=func.__name__, **schedule)
+    scheduler.start()
+
+    _lane_scheduler = scheduler
+    logger.info("🌙 LLM batch lane scheduler started")
+    return scheduler
+
+
+def lane_running():
+    return _lane_scheduler is not None and _lane_scheduler.running
@@ -0,0 +1,81 @@
+import threading
+
+from services.email_service import send_email
+from services.clinic_cache import get_clinic_route
+
+
+# ✅ FIXED NOTIFICATION FUNCTION (SAFE — NO CRASH)
+def send_clinic_notification(voicemail):
+
+    clinic = get_clinic_route(voicemail.clinic_id)
+
+    if not clinic:
+        print("Clinic not found. Skipping email.")
+        return
+
+    if not clinic.email:
+        print("Clinic email not configured. Skipping email.")
+        return
+
+    subject = f"New Voicemail - {(voicemail.urgency_level or 'unknown').upper()}"
+
+    html_content = f"""
+    <h2>New Voicemail Received</h2>
+
+    <p><strong>Summary:</strong> {voicemail.summary or 'N/A'}</p>
+    <p><strong>Urgency:</strong> {voicemail.urgency_level or 'N/A'}</p>
+    <p><strong>Triage Category:</strong> {voicemail.triage_category or 'N/A'}</p>
+
+    <hr>
+
+    <p><strong>Full Transcript:</strong></p>
+    <p>{voicemail.transcript or 'N/A'}</p>
+    """
+
+    success = send_email(clinic.email, subject, html_content)
+
+    if success:
+        print(f"✅ Notification email sent to {clinic.email}")
+    else:
+        print("❌ Email sending failed.")
+
+# ----------------------------
+# Early urgent alert (fired mid-stream by triage)
+# ----------------------------
+def make_urgent_alert(voicemail):
+    """
+    Returns an on_urgent callback for summarize_and_triage. The email goes
+    out on a background thread so the triage stream isn't held up; the
+    full notification still follows on completion.
+    """
+    clinic = get_clinic_route(voicemail.clinic_id)
+    transcript = voicemail.transcript or ""
+    voicemail_id = voicemail.id
+
+    def on_urgent(urgency_level):
+        if not clinic or not clinic.email:
+            print("Clinic email not configured. Skipping urgent alert.")
+            return
+
+        subject = f"URGENT Voicemail - {urgency_level.upper()} (summary to follow)"
+        html_content = f"""
+        <h2>Urgent Voicemail Received</h2>
+
+        <p><strong>Urgency:</strong> {urgency_level}</p>
+        <p>The full summary and triage will follow shortly.</p>
+
+        <hr>
+
+        <p><strong>Transcript:</strong></p>
+        <p>{transcript or 'N/A'}</p>
+        """
+
+        def send():
+            if send_email(clinic.email, subject, html_content):
+                print(f"🚨 Urgent alert for voicemail {voicemail_id} sent to {clinic.email}")
+            else:
+                print("❌ Urgent alert sending failed.")
+
+        threading.Thread(target=send, daemon=True).start()
+
+    return on_urgent
@@ -0,0 +1,81 @@
+import logging
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+from sqlalchemy import func
+
+from database import db, VoicemailEvent, Voicemail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def _percentile(sorted_values, fraction):
+    """Linear interpolation, same definition as percentile_cont."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def _label(fraction):
+    return f"p{round(fraction * 100, 1):g}"
+
+
+def stage_latency_percentiles(since=None, until=None, clinic_id=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Time spent in each status (from voicemail_events.duration_ms).
+    Returns {status: {"count": n, "p50": ms, "p90": ms, ...}}.
+    Percentiles are computed in the database on PostgreSQL and in Python
+    elsewhere.
+    """
+    since = since or datetime.utcnow() - timedelta(days=7)
+
+    filters = [
+        VoicemailEvent.created_at >= since,
+        VoicemailEvent.duration_ms.isnot(None),
+        VoicemailEvent.from_status.isnot(None),
+    ]
+    if until is not None:
+        filters.append(VoicemailEvent.created_at < until)
+
+    def scoped(query):
+        if clinic_id is not None:
+            query = query.join(Voicemail, Voicemail.id == VoicemailEvent.voicemail_id)
+            query = query.filter(Voicemail.clinic_id == clinic_id)
+        return query.filter(*filters)
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        columns = [
+            func.percentile_cont(fraction).within_group(VoicemailEvent.duration_ms)
+            for fraction in percentiles
+        ]
+        query = scoped(
+            db.session.query(VoicemailEvent.from_status, func.count(), *columns)
+        ).group_by(VoicemailEvent.from_status)
+
+        return {
+            status: {
+                "count": count,
+                **{_label(f): round(value) for f, value in zip(percentiles, values)}
+            }
+            for status, count, *values in query
+        }
+
+    durations = defaultdict(list)
+    query = scoped(db.session.query(VoicemailEvent.from_status, VoicemailEvent.duration_ms))
+    for status, duration_ms in query.yield_per(5000):
+        durations[status].append(duration_ms)
+
+    report = {}
+    for status, values in durations.items():
+        values.sort()
+        report[status] = {
+            "count": len(values),
+            **{_label(f): round(_percentile(values, f)) for f in percentiles}
+        }
+    return report
@@ -1,36 +1,541 @@
-import boto3
 import os
+import hmac
+import time
+import hashlib
+import logging
+import mimetypes
+import threading
 from uuid import uuid4
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote
 
-# Connect to S3
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION"),
-)
+logger = logging.getLogger(__name__)
 
-BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
+MB = 1024 * 1024
 
+# ------------------------
+# Backend selection
+# STORAGE_BACKEND=s3 (default) or local (single-machine runs / load tests)
+# ------------------------
 
-def upload_file(file_obj):
-    """Uploads file object to S3 and returns unique S3 key"""
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3")
+BUCKET_NAME = os.getenv("S3_BUCKET_NAME") or os.getenv("AUDIO_BUCKET", "voicecarepro-audio-prod")
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", os.path.join(BASE_DIR, "storage"))
+LOCAL_STORAGE_BASE_URL = os.getenv("LOCAL_STORAGE_BASE_URL", "http://localhost:10000")
+
+# ------------------------
+# Transfer tuning (env-configurable)
+# ------------------------
+
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "8"))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "10"))
+S3_BATCH_WORKERS = int(os.getenv("S3_BATCH_WORKERS", "8"))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_s3 = None
+_transfer_config = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Returns the single pooled S3 client for this process.
+    boto3 is only imported when S3 is actually used.
+    """
+    global _s3, _transfer_config
+    if _s3 is None:
+        with _client_lock:
+            if _s3 is None:
+                import boto3
+                from boto3.s3.transfer import TransferConfig
+                from botocore.config import Config
+
+                _transfer_config = TransferConfig(
+                    multipart_threshold=S3_MULTIPART_THRESHOLD_MB * MB,
+                    multipart_chunksize=S3_MULTIPART_CHUNKSIZE_MB * MB,
+                    max_concurrency=S3_MAX_CONCURRENCY,
+                    use_threads=True
+                )
+
+                # Pool sized for concurrent multipart + batch uploads
+                _s3 = boto3.client(
+                    "s3",
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    region_name=os.getenv("AWS_REGION"),
+                    config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+                )
+    return _s3
+
+
+class UploadProgress:
+    """
+    Thread-safe transfer callback.
+    Tracks bytes sent so throughput can be logged / reported.
+    """
+
+    def __init__(self, key, on_progress=None):
+        self.key = key
+        self.bytes_sent = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._on_progress = on_progress
+        self._lock = threading.Lock()
+
+    def __call__(self, bytes_amount):
+        with self._lock:
+            self.bytes_sent += bytes_amount
+            sent = self.bytes_sent
+        if self._on_progress:
+            self._on_progress(self.key, sent)
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+        return self.metrics()
+
+    def metrics(self):
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "key": self.key,
+            "bytes": self.bytes_sent,
+            "seconds": round(elapsed, 3),
+            "mb_per_second": round(self.bytes_sent / MB / elapsed, 2) if elapsed else None
+        }
+
+
+# ============================================================
+# STORAGE INTERFACE
+# ============================================================
+
+class StorageBackend:
+    """
+    Audio storage interface. Keys are "/"-separated object names
+    (e.g. voicemails/<uuid>.mp3).
+
+    head() returns {"size", "content_type", "etag", "last_modified"} or None.
+    stream() / get_range() take an inclusive byte range, like HTTP Range.
+    """
+
+    supports_presigned_post = False
+
+    def put(self, key, data, content_type=None):
+        raise NotImplementedError
+
+    def put_fileobj(self, key, file_obj, content_type=None, progress=None):
+        raise NotImplementedError
+
+    def put_file(self, key, path, content_type=None, progress=None):
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def stream(self, key, start=None, end=None, chunk_size=STREAM_CHUNK_SIZE):
+        raise NotImplementedError
+
+    def get_range(self, key, start, end):
+        return b"".join(self.stream(key, start, end))
+
+    def head(self, key):
+        raise NotImplementedError
+
+    def presign(self, key, expires_in):
+        raise NotImplementedError
+
+    def presigned_post(self, key, max_size, expires_in):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class S3Backend(StorageBackend):
+
+    supports_presigned_post = True
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    @property
+    def client(self):
+        return get_s3_client()
+
+    def put(self, key, data, content_type=None):
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+
+    def put_fileobj(self, key, file_obj, content_type=None, progress=None):
+        self.client.upload_fileobj(
+            file_obj,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type} if content_type else None,
+            Config=_transfer_config,
+            Callback=progress
+        )
+
+    def put_file(self, key, path, content_type=None, progress=None):
+        self.client.upload_file(
+            path,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type} if content_type else None,
+            Config=_transfer_config,
+            Callback=progress
+        )
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def stream(self, key, start=None, end=None, chunk_size=STREAM_CHUNK_SIZE):
+        params = {"Bucket": self.bucket, "Key": key}
+        if start is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+
+        body = self.client.get_object(**params)["Body"]
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    def head(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError:
+            return None
+
+        return {
+            "size": head["ContentLength"],
+            "content_type": head.get("ContentType"),
+            "etag": head.get("ETag", "").strip('"'),
+            "last_modified": head.get("LastModified")
+        }
+
+    def presign(self, key, expires_in):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in
+        )
+
+    def presigned_post(self, key, max_size, expires_in):
+        return self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields={"success_action_status": "201"},
+            Conditions=[
+                {"success_action_status": "201"},
+                ["starts-with", "$Content-Type", "audio/"],
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=expires_in
+        )
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+class LocalBackend(StorageBackend):
+    """
+    Stores objects as files under LOCAL_STORAGE_ROOT. Presigned URLs point
+    at the app's /media route and are HMAC-signed with SECRET_KEY.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _write(self, key, write):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def put(self, key, data, content_type=None):
+        self._write(key, lambda f: f.write(data))
+
+    def put_fileobj(self, key, file_obj, content_type=None, progress=None):
+        def copy(f):
+            while True:
+                chunk = file_obj.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                if progress:
+                    progress(len(chunk))
+        self._write(key, copy)
+
+    def put_file(self, key, path, content_type=None, progress=None):
+        with open(path, "rb") as f:
+            self.put_fileobj(key, f, content_type, progress)
+
+    def get(self, key):
+        with open(self.path_for(key), "rb") as f:
+            return f.read()
+
+    def stream(self, key, start=None, end=None, chunk_size=STREAM_CHUNK_SIZE):
+        with open(self.path_for(key), "rb") as f:
+            if start is not None:
+                f.seek(start)
+            remaining = None if end is None else end - (start or 0) + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def head(self, key):
+        try:
+            stat = os.stat(self.path_for(key))
+        except (FileNotFoundError, ValueError):
+            return None
+
+        return {
+            "size": stat.st_size,
+            "content_type": mimetypes.guess_type(key)[0],
+            "etag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+            "last_modified": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+        }
+
+    def presign(self, key, expires_in):
+        expires = int(time.time()) + expires_in
+        signature = sign_local_key(key, expires)
+        return (
+            f"{LOCAL_STORAGE_BASE_URL}/media/{quote(key)}"
+            f"?expires={expires}&signature={signature}"
+        )
+
+    def delete(self, key):
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+
+def sign_local_key(key, expires):
+    secret = (os.getenv("SECRET_KEY") or "").encode()
+    message = f"{key}:{expires}".encode()
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+def verify_local_signature(key, expires, signature):
+    """Validates a LocalBackend presigned URL."""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+
+    if expires < time.time():
+        return False
+
+    return hmac.compare_digest(sign_local_key(key, expires), signature or "")
+
+
+_storage = None
+
+
+def get_storage():
+    """Returns the process-wide storage backend."""
+    global _storage
+    if _storage is None:
+        with _client_lock:
+            if _storage is None:
+                if STORAGE_BACKEND == "local":
+                    _storage = LocalBackend(LOCAL_STORAGE_ROOT)
+                else:
+                    _storage = S3Backend(BUCKET_NAME)
+                logger.info(f"Storage backend: {type(_storage).__name__}")
+    return _storage
+
+
+# ============================================================
+# MODULE-LEVEL HELPERS (used by routes and workers)
+# ============================================================
+
+def upload_file(file_obj, on_progress=None):
+    """Uploads file object to storage and returns unique key"""
     unique_name = f"{uuid4()}_{file_obj.filename}"
 
-    s3.upload_fileobj(
-        file_obj,
-        BUCKET_NAME,
+    progress = UploadProgress(unique_name, on_progress)
+
+    get_storage().put_fileobj(
         unique_name,
-        ExtraArgs={"ContentType": file_obj.content_type}
+        file_obj,
+        content_type=file_obj.content_type,
+        progress=progress
+    )
+
+    metrics = progress.finish()
+    logger.info(
+        f"Uploaded {unique_name}: {metrics['bytes']} bytes "
+        f"in {metrics['seconds']}s ({metrics['mb_per_second']} MB/s)"
     )
 
     return unique_name
 
 
-def generate_presigned_url(s3_key):
-    """Returns a temporary URL valid for 1 hour"""
-    return s3.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": BUCKET_NAME, "Key": s3_key},
-        ExpiresIn=3600
+def upload_batch(paths, prefix="imports/", max_workers=None, on_progress=None):
+    """
+    Uploads many local files concurrently (bulk imports / backfills).
+    Returns one result per path, in order:
+    {"path", "key", "bytes", "seconds", "mb_per_second", "error"}
+    """
+    storage = get_storage()
+    max_workers = max_workers or S3_BATCH_WORKERS
+    started_at = time.monotonic()
+
+    def upload_one(path):
+        key = f"{prefix}{uuid4()}_{os.path.basename(path)}"
+        progress = UploadProgress(key, on_progress)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        try:
+            storage.put_file(key, path, content_type=content_type, progress=progress)
+            result = progress.finish()
+            result["error"] = None
+        except Exception as e:
+            logger.error(f"Batch upload failed for {path}: {e}")
+            result = progress.finish()
+            result["error"] = str(e)
+
+        result["path"] = path
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(upload_one, paths))
+
+    elapsed = time.monotonic() - started_at
+    total_bytes = sum(r["bytes"] for r in results)
+    failed = sum(1 for r in results if r["error"])
+
+    logger.info(
+        f"Batch upload: {len(results) - failed}/{len(results)} files, "
+        f"{total_bytes / MB:.1f} MB in {elapsed:.1f}s "
+        f"({total_bytes / MB / elapsed if elapsed else 0:.2f} MB/s)"
     )
+
+    return results
+
+
+# ------------------------
+# Presigned URL cache
+# URLs are reused until PRESIGNED_URL_SAFETY_MARGIN seconds before expiry,
+# so a handed-out URL always has at least that long left to live.
+# ------------------------
+
+PRESIGNED_URL_EXPIRES_IN = 3600
+PRESIGNED_URL_SAFETY_MARGIN = int(os.getenv("PRESIGNED_URL_SAFETY_MARGIN", "300"))
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "10000"))
+
+_presigned_cache = OrderedDict()  # s3_key -> (url, expires_at)
+_presigned_lock = threading.Lock()
+
+
+def _cached_presigned_url(s3_key, now):
+    item = _presigned_cache.get(s3_key)
+    if item is None:
+        return None
+
+    url, expires_at = item
+    if expires_at - PRESIGNED_URL_SAFETY_MARGIN <= now:
+        del _presigned_cache[s3_key]
+        return None
+
+    _presigned_cache.move_to_end(s3_key)
+    return url
+
+
+def _sign_get_url(s3_key, now):
+    url = get_storage().presign(s3_key, PRESIGNED_URL_EXPIRES_IN)
+    return url, now + PRESIGNED_URL_EXPIRES_IN
+
+
+def _store_presigned_urls(signed):
+    with _presigned_lock:
+        for s3_key, item in signed.items():
+            _presigned_cache[s3_key] = item
+            _presigned_cache.move_to_end(s3_key)
+        while len(_presigned_cache) > PRESIGNED_URL_CACHE_SIZE:
+            _presigned_cache.popitem(last=False)
+
+
+def generate_presigned_url(s3_key):
+    """Returns a temporary URL valid for 1 hour (cached until near expiry)"""
+    now = time.time()
+
+    with _presigned_lock:
+        url = _cached_presigned_url(s3_key, now)
+    if url:
+        return url
+
+    url, expires_at = _sign_get_url(s3_key, now)
+    _store_presigned_urls({s3_key: (url, expires_at)})
+    return url
+
+
+def generate_presigned_urls(s3_keys):
+    """
+    Bulk variant for list views. Returns {s3_key: url}; only keys
+    without a fresh cached URL are signed.
+    """
+    now = time.time()
+    urls = {}
+    missing = []
+
+    with _presigned_lock:
+        for s3_key in s3_keys:
+            if not s3_key or s3_key in urls:
+                continue
+            url = _cached_presigned_url(s3_key, now)
+            if url:
+                urls[s3_key] = url
+            else:
+                missing.append(s3_key)
+
+    signed = {s3_key: _sign_get_url(s3_key, now) for s3_key in missing}
+    _store_presigned_urls(signed)
+
+    urls.update({s3_key: item[0] for s3_key, item in signed.items()})
+    return urls
+
+
+def invalidate_presigned_url(s3_key):
+    """Drops the cached URL of a deleted or replaced object."""
+    with _presigned_lock:
+        _presigned_cache.pop(s3_key, None)
+
+
+def generate_presigned_post(s3_key, max_size, expires_in=600):
+    """
+    Returns a presigned POST (url + form fields) so the browser can upload
+    directly to S3, or None if the backend has no direct-upload support.
+    The policy pins the key, requires an audio/* content type and caps the
+    size at max_size bytes.
+    """
+    storage = get_storage()
+    if not storage.supports_presigned_post:
+        return None
+    return storage.presigned_post(s3_key, max_size, expires_in)
+
+
+def get_object_info(s3_key):
+    """Returns size/content type/etag for a stored object, or None if missing"""
+    return get_storage().head(s3_key)
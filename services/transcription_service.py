@@ -2,6 +2,7 @@
 import openai
 from pathlib import Path
 from run import logger
+from services.storage_service import get_storage
 
 # Make sure your OPENAI_API_KEY is set in .env
 # e.g., export OPENAI_API_KEY="sk-..."
@@ -11,19 +12,19 @@ def transcribe_audio(filename: str):
     Transcribe an audio file using OpenAI Whisper (v1+ SDK)
     Returns: transcript (str), confidence (None, not provided by API)
     """
-    file_path = Path("uploads") / filename
+    storage = get_storage()
 
-    if not file_path.exists():
-        raise FileNotFoundError(f"Audio file not found: {file_path}")
+    if not storage.head(filename):
+        raise FileNotFoundError(f"Audio file not found: {filename}")
 
-    logger.debug(f"DEBUG: Transcribing file at {file_path}")
+    logger.debug(f"DEBUG: Transcribing stored file {filename}")
 
     try:
-        with open(file_path, "rb") as f:
-            response = openai.audio.transcriptions.create(
-                model="whisper-1",
-                file=f
-            )
+        audio = storage.get(filename)
+        response = openai.audio.transcriptions.create(
+            model="whisper-1",
+            file=(Path(filename).name, audio)
+        )
 
         transcript = response.text
         confidence = None  # Whisper API v1 does not return confidence
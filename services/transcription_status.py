@@ -9,13 +9,12 @@ def update_voicemail_status(voicemail_id, new_status, failure_reason=None):
     if not voicemail:
         raise ValueError("Voicemail not found")
 
+    # update_status commits
     voicemail.update_status(
         new_status=new_status,
         failure_reason=failure_reason
     )
 
-    db.session.commit()
-
 
 def get_next_voicemail():
     """
@@ -0,0 +1,82 @@
+import os
+import logging
+
+from database import db, TriageCard
+
+logger = logging.getLogger(__name__)
+
+TRIAGE_CARD_UPSERT_BATCH = int(os.getenv("TRIAGE_CARD_UPSERT_BATCH", "500"))
+
+# Digest buckets are "urgent" / "non_urgent"
+URGENT_LEVELS = {"urgent", "high"}
+
+# Columns a retry overwrites; created_at and digest_sent_at are kept
+_UPDATE_COLUMNS = ("clinic_id", "summary", "urgency", "crisis_flag", "needs_review")
+
+
+def triage_card_values(voicemail, crisis_flag=False):
+    """Row for one voicemail's triage card."""
+    return {
+        "voicemail_id": voicemail.id,
+        "clinic_id": voicemail.clinic_id,
+        "summary": voicemail.summary or "Summary unavailable — review the transcript",
+        "urgency": "urgent" if voicemail.urgency_level in URGENT_LEVELS or crisis_flag else "non_urgent",
+        "crisis_flag": bool(crisis_flag),
+        "needs_review": voicemail.status == "needs_review" or bool(crisis_flag),
+    }
+
+
+def _dialect_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def upsert_triage_cards(rows):
+    """
+    INSERT ... ON CONFLICT (voicemail_id) DO UPDATE, in batches of
+    TRIAGE_CARD_UPSERT_BATCH. Does not commit — runs in the caller's
+    transaction so the card lands with the voicemail's final status.
+    """
+    if not rows:
+        return
+
+    insert = _dialect_insert()
+
+    if insert is None:
+        _merge_triage_cards(rows)
+        return
+
+    for start in range(0, len(rows), TRIAGE_CARD_UPSERT_BATCH):
+        chunk = rows[start:start + TRIAGE_CARD_UPSERT_BATCH]
+        stmt = insert(TriageCard).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TriageCard.voicemail_id],
+            set_={column: stmt.excluded[column] for column in _UPDATE_COLUMNS}
+        )
+        db.session.execute(stmt)
+
+    logger.info(f"🗂️ Upserted {len(rows)} triage cards")
+
+
+def _merge_triage_cards(rows):
+    """Fallback for dialects without ON CONFLICT: one SELECT, then update/insert."""
+    existing = {
+        card.voicemail_id: card
+        for card in TriageCard.query.filter(
+            TriageCard.voicemail_id.in_([row["voicemail_id"] for row in rows])
+        )
+    }
+
+    for row in rows:
+        card = existing.get(row["voicemail_id"])
+        if card is None:
+            db.session.add(TriageCard(**row))
+        else:
+            for column in _UPDATE_COLUMNS:
+                setattr(card, column, row[column])
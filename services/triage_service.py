@@ -1,8 +1,8 @@
 import os
-import json
-import logging
 from openai import OpenAI
 
+from utils.llm_schemas import PsychTriage, response_format, parse_response
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 CRISIS_KEYWORDS = [
@@ -21,19 +21,15 @@ def detect_crisis(transcript: str) -> bool:
     return any(keyword in lower for keyword in CRISIS_KEYWORDS)
 
 
-def extract_triage(transcript: str):
-    """
-    Existing triage logic using OpenAI.
-    """
-
-    crisis_flag = detect_crisis(transcript)
+def crisis_request(transcript: str):
+    """chat.completions.create kwargs for the psychiatric second pass."""
 
     prompt = f"""
 You are assisting a psychiatric clinic.
 
 Analyze the voicemail transcript below.
 
-Return ONLY valid JSON with:
+Return:
 - summary (2-3 sentence concise summary)
 - urgency ("urgent" or "non_urgent")
 
@@ -48,46 +44,52 @@ Transcript:
 \"\"\"{transcript}\"\"\"
 """
 
-    response = client.chat.completions.create(
+    return dict(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": "You summarize psychiatric voicemails safely."},
             {"role": "user", "content": prompt}
         ],
-        temperature=0.2
+        temperature=0.2,
+        response_format=response_format(PsychTriage)
     )
 
-    content = response.choices[0].message.content
 
-    # ✅ SAFE JSON PARSING (Prevents Worker Crash)
-    try:
-        structured = json.loads(content)
-    except Exception as e:
-        logging.error(f"JSON parse failed: {e}")
+def crisis_result(raw_text, transcript: str):
+    """Parses a crisis_request completion (real-time or batch)."""
+
+    crisis_flag = detect_crisis(transcript)
+
+    # ✅ Schema-validated (None on failure, counted — never crashes the worker)
+    structured = parse_response(PsychTriage, raw_text)
+    if structured is None:
         return None
 
-    urgency = structured["urgency"]
+    urgency = structured.urgency
 
     # Safety override
     if crisis_flag:
         urgency = "urgent"
 
     return {
-        "summary": structured["summary"],
+        "summary": structured.summary,
         "urgency": urgency,
         "crisis_flag": crisis_flag,
         "needs_review": crisis_flag
     }
 
 
-# ✅ NEW FUNCTION REQUIRED BY WORKER
-def analyze_transcription(transcription_text: str):
+def extract_triage(transcript: str):
     """
-    Wrapper function used by the worker.
-    Returns summary, urgency_level, and crisis_flag.
+    Existing triage logic using OpenAI.
     """
 
-    result = extract_triage(transcription_text)
+    response = client.chat.completions.create(**crisis_request(transcript))
+    return crisis_result(response.choices[0].message.content, transcript)
+
+
+def to_analysis(result):
+    """extract_triage result in the shape the worker uses."""
 
     if result is None:
         return None
@@ -97,3 +99,28 @@ def analyze_transcription(transcription_text: str):
         "urgency_level": result["urgency"],  # renamed for worker compatibility
         "crisis_flag": result["crisis_flag"]
     }
+
+
+def keyword_analysis(transcript: str):
+    """
+    Fallback when the model review failed or was unusable: the keyword
+    crisis check alone, so a crisis call still goes to review.
+    """
+
+    crisis_flag = detect_crisis(transcript or "")
+
+    return {
+        "summary": None,
+        "urgency_level": "urgent" if crisis_flag else None,
+        "crisis_flag": crisis_flag
+    }
+
+
+# ✅ NEW FUNCTION REQUIRED BY WORKER
+def analyze_transcription(transcription_text: str):
+    """
+    Wrapper function used by the worker.
+    Returns summary, urgency_level, and crisis_flag.
+    """
+
+    return to_analysis(extract_triage(transcription_text))
@@ -0,0 +1,43 @@
+# stage_latency_report.py
+"""
+Prints per-status latency percentiles from the voicemail_events log
+(time voicemails spend in each status before moving on).
+
+Usage:
+    python stage_latency_report.py [--days 7] [--clinic-id 3]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from run import app
+from services.pipeline_metrics import stage_latency_percentiles
+
+
+def print_report(days, clinic_id):
+    since = datetime.utcnow() - timedelta(days=days)
+    report = stage_latency_percentiles(since=since, clinic_id=clinic_id)
+
+    scope = f"clinic {clinic_id}" if clinic_id else "all clinics"
+    print(f"📊 Stage latency, last {days} days ({scope})")
+
+    if not report:
+        print("No events recorded yet.")
+        return
+
+    print(f"{'status':<22}{'count':>8}{'p50 s':>10}{'p90 s':>10}{'p99 s':>10}")
+    for status, row in sorted(report.items(), key=lambda item: -item[1]["p50"]):
+        print(
+            f"{status:<22}{row['count']:>8}"
+            f"{row['p50'] / 1000:>10.1f}{row['p90'] / 1000:>10.1f}{row['p99'] / 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Voicemail stage latency percentiles")
+    parser.add_argument("--days", type=int, default=7, help="look-back window")
+    parser.add_argument("--clinic-id", type=int, default=None, help="limit to one clinic")
+    args = parser.parse_args()
+
+    with app.app_context():
+        print_report(args.days, args.clinic_id)
@@ -1,2 +1,88 @@
 // static/js/main.js
 console.log("✅ VoiceCare Pro main.js loaded");
+
+// ------------------------
+// DIRECT-TO-S3 UPLOAD
+// Browser uploads the audio straight to S3 with a presigned POST,
+// then tells the app to create the voicemail. Falls back to the
+// regular /upload form post if the ticket can't be issued.
+// ------------------------
+
+async function postJSON(url, payload) {
+    const response = await fetch(url, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        credentials: "same-origin",
+        body: JSON.stringify(payload)
+    });
+    const data = await response.json().catch(() => ({}));
+    if (!response.ok) {
+        throw new Error(data.error || `Request failed (${response.status})`);
+    }
+    return data;
+}
+
+async function directUpload(file) {
+    const contentType = file.type || "audio/mpeg";
+
+    let ticket;
+    try {
+        ticket = await postJSON("/upload/ticket", {
+            filename: file.name,
+            content_type: contentType,
+            size: file.size
+        });
+    } catch (err) {
+        err.fallback = true;
+        throw err;
+    }
+
+    const form = new FormData();
+    Object.entries(ticket.fields).forEach(([name, value]) => form.append(name, value));
+    form.append("Content-Type", contentType);
+    form.append("file", file);  // must be the last field
+
+    const upload = await fetch(ticket.url, { method: "POST", body: form });
+    if (!upload.ok) {
+        throw new Error(`S3 upload failed (${upload.status})`);
+    }
+
+    return postJSON("/upload/complete", { key: ticket.key });
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+    const form = document.querySelector("form[data-direct-upload]");
+    if (!form) {
+        return;
+    }
+
+    form.addEventListener("submit", async (event) => {
+        const input = form.querySelector("input[type=file]");
+        const file = input && input.files[0];
+        if (!file || !window.fetch) {
+            return;  // let the browser post the form normally
+        }
+
+        event.preventDefault();
+        const button = form.querySelector("button[type=submit]");
+        if (button) {
+            button.disabled = true;
+        }
+
+        try {
+            await directUpload(file);
+            window.location.reload();
+        } catch (err) {
+            if (err.fallback) {
+                console.error("Upload ticket unavailable, falling back:", err);
+                form.submit();
+                return;
+            }
+            console.error("Direct upload failed:", err);
+            alert(`Upload failed: ${err.message}`);
+            if (button) {
+                button.disabled = false;
+            }
+        }
+    });
+});
@@ -2,10 +2,19 @@ from services.transcription_status import update_voicemail_status
 from database import db, Voicemail
 
 import os
-import json
+import re
 import logging
 
 from services.storage_service import generate_presigned_url
+from utils.classifier import classify_intent
+from utils.llm_schemas import (
+    PatientInfo,
+    VoicemailTriage,
+    VoicemailSummary,
+    OPENAI_STRUCTURED_MODEL,
+    response_format,
+    parse_response
+)
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +32,164 @@ def is_retryable_error(e):
     ])
 
 
+# Urgency levels that trigger the early alert while triage is still streaming
+EARLY_ALERT_URGENCY_LEVELS = {"urgent", "high"}
+
+_URGENCY_FIELD = re.compile(r'"urgency_level"\s*:\s*"([^"]*)"')
+
+
+def scan_urgency(partial_json):
+    """
+    Returns urgency_level from a partially streamed JSON object once its
+    string value is complete, else None.
+    """
+    match = _URGENCY_FIELD.search(partial_json)
+    return match.group(1).strip().lower() if match else None
+
+
+# ============================================================
+# REQUEST BUILDERS / RESULT PARSERS
+# Shared by the real-time calls below and the overnight batch lane
+# ============================================================
+
+TRIAGE_FALLBACK = {
+    'summary': "Error processing voicemail",
+    'urgency_level': 'medium',
+    'recommended_action': 'Manual review required',
+    'department_routing': 'Administration'
+}
+
+
+def extraction_request(transcription):
+    """chat.completions.create kwargs for patient info extraction"""
+    prompt = f"""
+    Extract patient information from this healthcare voicemail transcription.
+
+    Transcription: "{transcription}"
+
+    - patient_name: full name, or null
+    - patient_dob: date of birth in MM/DD/YYYY format, or null
+    - patient_phone: phone number, or null
+    - call_reason: brief reason for the call, or null
+    """
+
+    return dict(
+        model=OPENAI_STRUCTURED_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.1,
+        max_tokens=200,
+        response_format=response_format(PatientInfo)
+    )
+
+
+def extraction_result(raw_text):
+    result = parse_response(PatientInfo, raw_text)
+
+    if result is None:
+        return {
+            'success': False,
+            'error': 'Patient info response failed validation',
+            'patient_name': None,
+            'patient_dob': None,
+            'patient_phone': None,
+            'call_reason': None
+        }
+
+    return {'success': True, **result.model_dump()}
+
+
+def triage_request(transcription, patient_info, routing=True):
+    """
+    chat.completions.create kwargs for summary + triage.
+    routing=False drops recommended_action / department_routing.
+    """
+    patient_section = f"""
+    Patient Info:
+    - Name: {patient_info.get('patient_name') or 'Unknown'}
+    - Reason: {patient_info.get('call_reason') or 'Not specified'}
+""" if patient_info else ""
+    routing_fields = """
+    - recommended_action: what should be done next
+    - department_routing: which department should handle this""" if routing else ""
+
+    prompt = f"""
+    Analyze this healthcare voicemail for summarization and triage routing.
+
+    Transcription: "{transcription}"
+{patient_section}
+    - urgency_level: low, medium, high or urgent
+    - summary: 2-3 sentence summary of the call{routing_fields}
+    """
+
+    return dict(
+        model=OPENAI_STRUCTURED_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=300,
+        response_format=response_format(VoicemailTriage if routing else VoicemailSummary)
+    )
+
+
+def triage_result(raw_text, routing=True):
+    result = parse_response(VoicemailTriage if routing else VoicemailSummary, raw_text)
+
+    if result is None:
+        return dict(TRIAGE_FALLBACK, success=False)
+
+    return {
+        'success': True,
+        'recommended_action': None,
+        'department_routing': None,
+        **result.model_dump()
+    }
+
+
+def apply_triage_result(voicemail, summary_data, routing=True):
+    """
+    Copies a successful triage result onto the voicemail. Without routing,
+    triage_category falls back to the keyword intent classifier.
+    """
+    if not summary_data.get("success"):
+        return
+
+    voicemail.summary = summary_data.get("summary")
+    voicemail.urgency_level = summary_data.get("urgency_level")
+    voicemail.triage_category = (
+        summary_data.get("department_routing") if routing
+        else classify_intent(voicemail.transcript or "")
+    )
+
+
+def apply_analysis_results(voicemail, results, routing=True):
+    """
+    Copies whichever of the extraction / triage / crisis_review results
+    ran onto the voicemail. Returns (final_status, crisis_flag):
+    unusable model output and crisis calls go to a human.
+    """
+    patient_info = results.get("extraction")
+    if patient_info and patient_info.get("success"):
+        voicemail.patient_info = {
+            key: patient_info.get(key)
+            for key in ("patient_name", "patient_dob", "patient_phone", "call_reason")
+        }
+
+    triage_ok = True
+    summary_data = results.get("triage")
+    if summary_data is not None:
+        apply_triage_result(voicemail, summary_data, routing=routing)
+        triage_ok = summary_data.get("success")
+
+    crisis_flag = False
+    crisis = results.get("crisis_review")
+    if crisis:
+        crisis_flag = crisis["crisis_flag"]
+        if crisis["urgency_level"] == "urgent":
+            voicemail.urgency_level = "urgent"
+
+    status = "completed" if triage_ok and not crisis_flag else "needs_review"
+    return status, crisis_flag
+
+
 class VoicemailAIProcessor:
     """Handle AI processing of voicemails with robust error handling"""
 
@@ -35,35 +202,73 @@ class VoicemailAIProcessor:
     # ✅ TRANSCRIPTION (DEEPGRAM v5 - nova-2-medical)
     # ============================================================
 
+    DEEPGRAM_OPTIONS = {
+        "model": "nova-2-medical",
+        "punctuate": True,
+        "diarize": False,
+        "smart_format": True,
+        "language": "en"
+    }
+
+    def _deepgram(self):
+        from deepgram import DeepgramClient
+        return DeepgramClient(self.api_key)
+
+    @staticmethod
+    def _best_alternative(response):
+        alternative = response.results.channels[0].alternatives[0]
+        return alternative.transcript, alternative.confidence
+
     def transcribe_audio(self, s3_key):
         """
         Transcribe audio from S3 using Deepgram v5
         Returns: (transcript, confidence)
         """
 
-        from deepgram import DeepgramClient
-
-        client = DeepgramClient(self.api_key)
+        client = self._deepgram()
 
         audio_url = generate_presigned_url(s3_key)
 
-        options = {
-            "model": "nova-2-medical",
-            "punctuate": True,
-            "diarize": False,
-            "smart_format": True,
-            "language": "en"
-        }
-
         response = client.listen.prerecorded.v("1").transcribe_url(
             {"url": audio_url},
-            options
+            self.DEEPGRAM_OPTIONS
+        )
+
+        return self._best_alternative(response)
+
+    def submit_transcription(self, s3_key, callback_url):
+        """
+        Submit audio to Deepgram in callback mode. Returns immediately;
+        the result is POSTed to callback_url.
+        Returns: Deepgram request_id
+        """
+
+        client = self._deepgram()
+
+        audio_url = generate_presigned_url(s3_key)
+
+        response = client.listen.prerecorded.v("1").transcribe_url_callback(
+            {"url": audio_url},
+            callback_url,
+            self.DEEPGRAM_OPTIONS
         )
 
-        transcript = response.results.channels[0].alternatives[0].transcript
-        confidence = response.results.channels[0].alternatives[0].confidence
+        return response.request_id
 
-        return transcript, confidence
+    def transcribe_audio_bytes(self, data, mimetype):
+        """
+        Transcribe in-memory audio (e.g. one chunk of a long recording)
+        Returns: (transcript, confidence)
+        """
+
+        client = self._deepgram()
+
+        response = client.listen.prerecorded.v("1").transcribe_file(
+            {"buffer": data, "mimetype": mimetype},
+            self.DEEPGRAM_OPTIONS
+        )
+
+        return self._best_alternative(response)
 
     # ============================================================
     # PATIENT INFO EXTRACTION
@@ -74,46 +279,13 @@ class VoicemailAIProcessor:
         try:
             logger.info(f"🔎 Extracting patient info for transcript: {transcription[:50]}...")
 
-            prompt = f"""
-            Extract patient information from this healthcare voicemail transcription. Return JSON only.
-
-            Transcription: "{transcription}"
-
-            Extract and return in this exact JSON format:
-            {{
-                "patient_name": "Full name or null",
-                "patient_dob": "Date of birth (MM/DD/YYYY format) or null",
-                "patient_phone": "Phone number or null",
-                "call_reason": "Brief reason for call or null"
-            }}
-            """
-
             from openai import OpenAI
             client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=200
-            )
-
-            result_text = response.choices[0].message.content.strip()
+            response = client.chat.completions.create(**extraction_request(transcription))
             logger.info("✅ OpenAI extraction completed")
 
-            try:
-                result = json.loads(result_text)
-            except Exception:
-                logger.warning(f"Patient info JSON parse failed. Raw response: {result_text}")
-                result = {}
-
-            return {
-                'success': True,
-                'patient_name': result.get('patient_name'),
-                'patient_dob': result.get('patient_dob'),
-                'patient_phone': result.get('patient_phone'),
-                'call_reason': result.get('call_reason')
-            }
+            return extraction_result(response.choices[0].message.content)
 
         except Exception as e:
             logger.error(f"❌ Extraction failed: {e}")
@@ -130,72 +302,62 @@ class VoicemailAIProcessor:
     # SUMMARY + TRIAGE
     # ============================================================
 
-    def summarize_and_triage(self, transcription, patient_info):
-        """Create summary and determine triage routing"""
+    def summarize_and_triage(self, transcription, patient_info, on_urgent=None, routing=True):
+        """
+        Create summary and determine triage routing.
+        With on_urgent, the completion is streamed and on_urgent(level) is
+        called as soon as an urgent/high urgency_level has been emitted.
+        routing=False skips the department routing fields.
+        """
         try:
             logger.info("🧠 Summarizing and triaging...")
             logger.info(f"Transcript preview: {transcription[:50]}...")
 
-            prompt = f"""
-            Analyze this healthcare voicemail for summarization and triage routing.
-
-            Transcription: "{transcription}"
-
-            Patient Info:
-            - Name: {patient_info.get('patient_name', 'Unknown')}
-            - Reason: {patient_info.get('call_reason', 'Not specified')}
-
-            Provide response in this JSON format:
-            {{
-                "summary": "2-3 sentence summary of the call",
-                "urgency_level": "low|medium|high|urgent",
-                "recommended_action": "What should be done next",
-                "department_routing": "Which department should handle this"
-            }}
-            """
-
             from openai import OpenAI
             client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=300
-            )
+            request = triage_request(transcription, patient_info, routing=routing)
+
+            if on_urgent:
+                raw_text = self._stream_triage(client, request, on_urgent)
+            else:
+                response = client.chat.completions.create(**request)
+                raw_text = response.choices[0].message.content.strip()
 
-            raw_text = response.choices[0].message.content.strip()
             logger.info("✅ Summarization & triage completed")
             logger.info(f"📄 RAW OpenAI response: {raw_text}")
 
-            try:
-                result = json.loads(raw_text)
-            except Exception:
-                logger.warning("Triage JSON parse failed. Marking needs_review.")
-                result = {
-                    "summary": "Error processing voicemail",
-                    "urgency_level": "medium",
-                    "recommended_action": "Manual review required",
-                    "department_routing": "Administration"
-                }
-
-            return {
-                'success': True,
-                'summary': result.get('summary'),
-                'urgency_level': result.get('urgency_level'),
-                'recommended_action': result.get('recommended_action'),
-                'department_routing': result.get('department_routing')
-            }
+            return triage_result(raw_text, routing=routing)
 
         except Exception as e:
             logger.error(f"❌ Summarization failed: {e}")
-            return {
-                'success': False,
-                'summary': "Error processing voicemail",
-                'urgency_level': 'medium',
-                'recommended_action': 'Manual review required',
-                'department_routing': 'Administration'
-            }
+            return dict(TRIAGE_FALLBACK, success=False)
+
+    def _stream_triage(self, client, request, on_urgent):
+        """Streams the triage completion, firing on_urgent at most once."""
+        parts = []
+        urgency = None
+
+        stream = client.chat.completions.create(stream=True, **request)
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+
+            if urgency is None:
+                urgency = scan_urgency("".join(parts))
+                if urgency in EARLY_ALERT_URGENCY_LEVELS:
+                    logger.info(f"🚨 Early urgency detected while streaming: {urgency}")
+                    try:
+                        on_urgent(urgency)
+                    except Exception as e:
+                        logger.error(f"❌ Early urgent alert failed: {e}")
+
+        return "".join(parts).strip()
 
     # ============================================================
     # COMPLETE PIPELINE
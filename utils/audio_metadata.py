@@ -0,0 +1,408 @@
+# utils/audio_metadata.py
+"""
+Duration / codec / sample-rate probing from container headers only.
+
+Nothing is decoded: WAV uses the RIFF fmt/data chunks, MP3 the first
+frame header plus Xing/Info/VBRI (or CBR size math), M4A the moov/mvhd
+and stsd boxes, FLAC the STREAMINFO block and Ogg the first and last
+page granule positions. Callers pass the first HEAD_BYTES of the file
+and, when a format needs it, a callable that returns the last
+TAIL_BYTES (so S3 objects can be probed with two small ranged GETs).
+"""
+
+import struct
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+HEAD_BYTES = 64 * 1024
+TAIL_BYTES = 64 * 1024
+
+AudioInfo = namedtuple("AudioInfo", ["duration", "codec", "sample_rate", "channels"])
+
+
+def probe_audio(head, total_size=None, read_tail=None):
+    """
+    Returns AudioInfo (duration in seconds as float, or None if unknown)
+    or None if the container isn't recognised.
+
+    head: first bytes of the file (HEAD_BYTES is plenty)
+    total_size: full file size in bytes, if known
+    read_tail: optional callable returning the last bytes of the file
+    """
+    try:
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            return _probe_wav(head, total_size)
+        if head[:4] == b"fLaC":
+            return _probe_flac(head)
+        if head[:4] == b"OggS":
+            return _probe_ogg(head, read_tail)
+        if head[4:8] == b"ftyp":
+            return _probe_mp4(head, total_size, read_tail)
+        if head[:3] == b"ID3" or _find_mp3_frame(head, 0) is not None:
+            return _probe_mp3(head, total_size, read_tail)
+    except (struct.error, IndexError, ValueError, ZeroDivisionError) as e:
+        logger.warning(f"Audio header probe failed: {e}")
+
+    return None
+
+
+def probe_bytes(data):
+    """Probes an in-memory audio file."""
+    return probe_audio(data[:HEAD_BYTES], len(data), lambda: data[-TAIL_BYTES:])
+
+
+def probe_fileobj(file_obj):
+    """Probes a seekable file object and rewinds it afterwards."""
+    start = file_obj.tell()
+    head = file_obj.read(HEAD_BYTES)
+    file_obj.seek(0, 2)
+    total_size = file_obj.tell() - start
+
+    def read_tail():
+        file_obj.seek(max(start, start + total_size - TAIL_BYTES))
+        return file_obj.read(TAIL_BYTES)
+
+    try:
+        return probe_audio(head, total_size, read_tail)
+    finally:
+        file_obj.seek(start)
+
+
+def probe_stored(storage, key, size=None):
+    """
+    Probes an object in a storage backend with ranged reads
+    (first HEAD_BYTES, and the last TAIL_BYTES only if needed).
+    """
+    if size is None:
+        info = storage.head(key)
+        if not info:
+            return None
+        size = info["size"]
+
+    if not size:
+        return AudioInfo(0.0, None, None, None)
+
+    head = storage.get_range(key, 0, min(size, HEAD_BYTES) - 1)
+
+    def read_tail():
+        if size <= HEAD_BYTES:
+            return head
+        return storage.get_range(key, max(0, size - TAIL_BYTES), size - 1)
+
+    return probe_audio(head, size, read_tail)
+
+
+def is_empty_audio(info):
+    """True when the header says there is no audio at all."""
+    return info is not None and info.duration is not None and info.duration <= 0
+
+
+def audio_columns(info):
+    """Voicemail column values for an AudioInfo (all None if unknown)."""
+    if info is None:
+        return {"audio_duration": None, "audio_codec": None, "audio_sample_rate": None}
+
+    return {
+        "audio_duration": None if info.duration is None else int(round(info.duration)),
+        "audio_codec": info.codec,
+        "audio_sample_rate": info.sample_rate
+    }
+
+
+# ============================================================
+# WAV (RIFF)
+# ============================================================
+
+WAV_CODECS = {1: "pcm", 3: "pcm_float", 6: "alaw", 7: "ulaw", 0xFFFE: "pcm"}
+
+
+def _probe_wav(head, total_size):
+    offset = 12
+    byte_rate = sample_rate = channels = None
+    codec = "wav"
+
+    while offset + 8 <= len(head):
+        chunk_id = head[offset:offset + 4]
+        chunk_size = struct.unpack_from("<I", head, offset + 4)[0]
+        body = offset + 8
+
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate, byte_rate = struct.unpack_from("<HHII", head, body)
+            codec = WAV_CODECS.get(audio_format, f"wav_{audio_format}")
+
+        elif chunk_id == b"data":
+            if not byte_rate:
+                break
+            # Streaming writers leave 0 / 0xFFFFFFFF; fall back to the file size
+            if total_size and (chunk_size in (0, 0xFFFFFFFF) or body + chunk_size > total_size):
+                chunk_size = max(total_size - body, 0)
+            return AudioInfo(chunk_size / byte_rate, codec, sample_rate, channels)
+
+        offset = body + chunk_size + (chunk_size & 1)
+
+    return AudioInfo(None, codec, sample_rate, channels)
+
+
+# ============================================================
+# MP3 (MPEG audio)
+# ============================================================
+
+MP3_BITRATES = {
+    # (version_is_1, layer) -> kbps by index
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG 1
+    2: [22050, 24000, 16000],  # MPEG 2
+    0: [11025, 12000, 8000],   # MPEG 2.5
+}
+
+
+def _parse_mp3_header(data, offset):
+    if offset + 4 > len(data):
+        return None
+
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = (b2 >> 4) & 0x0F
+    rate_index = (b2 >> 2) & 0x03
+    padding = (b2 >> 1) & 0x01
+    channel_mode = (b3 >> 6) & 0x03
+
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    is_v1 = version == 3
+    bitrate = MP3_BITRATES[(is_v1, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or is_v1) else 576
+        frame_length = samples // 8 * bitrate // sample_rate + padding
+
+    return {
+        "is_v1": is_v1,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "samples": samples,
+        "channels": 1 if channel_mode == 3 else 2,
+        "frame_length": frame_length,
+    }
+
+
+def _find_mp3_frame(data, start):
+    """Finds the first frame header that is followed by another valid one."""
+    offset = start
+    while True:
+        offset = data.find(b"\xff", offset)
+        if offset < 0 or offset + 4 > len(data):
+            return None
+
+        header = _parse_mp3_header(data, offset)
+        if header:
+            following = offset + header["frame_length"]
+            if following + 4 > len(data) or _parse_mp3_header(data, following):
+                return offset, header
+
+        offset += 1
+
+
+def _probe_mp3(head, total_size, read_tail):
+    audio_start = 0
+    if head[:3] == b"ID3":
+        tag_size = 0
+        for byte in head[6:10]:
+            tag_size = (tag_size << 7) | (byte & 0x7F)
+        audio_start = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+
+    if audio_start >= len(head):
+        # Huge ID3 tag (embedded artwork): no frame within the head bytes
+        return AudioInfo(None, "mp3", None, None)
+
+    found = _find_mp3_frame(head, audio_start)
+    if found is None:
+        return AudioInfo(None, "mp3", None, None)
+
+    offset, header = found
+    codec = "mp3" if header["layer"] == 3 else f"mp{header['layer']}"
+    sample_rate = header["sample_rate"]
+
+    # Xing / Info header (VBR or LAME CBR) sits after the side info
+    if header["is_v1"]:
+        side_info = 17 if header["channels"] == 1 else 32
+    else:
+        side_info = 9 if header["channels"] == 1 else 17
+
+    xing = offset + 4 + side_info
+    if head[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", head, xing + 4)[0]
+        if flags & 0x01:
+            frames = struct.unpack_from(">I", head, xing + 8)[0]
+            return AudioInfo(frames * header["samples"] / sample_rate, codec, sample_rate, header["channels"])
+
+    # VBRI header (Fraunhofer) is always 32 bytes after the frame header
+    vbri = offset + 4 + 32
+    if head[vbri:vbri + 4] == b"VBRI":
+        frames = struct.unpack_from(">I", head, vbri + 14)[0]
+        return AudioInfo(frames * header["samples"] / sample_rate, codec, sample_rate, header["channels"])
+
+    # CBR: size / bitrate
+    if not total_size:
+        return AudioInfo(None, codec, sample_rate, header["channels"])
+
+    audio_bytes = total_size - offset
+    if read_tail:
+        tail = read_tail()
+        if len(tail) >= 128 and tail[-128:-125] == b"TAG":
+            audio_bytes -= 128
+
+    return AudioInfo(max(audio_bytes, 0) * 8 / header["bitrate"], codec, sample_rate, header["channels"])
+
+
+# ============================================================
+# MP4 / M4A
+# ============================================================
+
+MP4_CODECS = {b"mp4a": "aac", b"alac": "alac", b"samr": "amr", b"Opus": "opus", b"fLaC": "flac"}
+MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+def _iter_boxes(data, start, end):
+    """Yields (type, box_start, body_start, box_end); boxes may run past data."""
+    offset = start
+    while offset + 8 <= min(end, len(data)):
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset, offset + header, offset + size
+        offset += size
+
+
+def _parse_moov(data, start, end):
+    duration = codec = sample_rate = channels = None
+
+    def walk(box_start, box_end):
+        nonlocal duration, codec, sample_rate, channels
+        for box_type, _, body, box_stop in _iter_boxes(data, box_start, min(box_end, len(data))):
+            if box_type == b"mvhd":
+                if data[body] == 1:
+                    timescale, length = struct.unpack_from(">IQ", data, body + 20)
+                else:
+                    timescale, length = struct.unpack_from(">II", data, body + 12)
+                if timescale:
+                    duration = length / timescale
+            elif box_type == b"stsd" and codec is None:
+                # full box header (4) + entry count (4), then the first sample entry
+                entry = body + 8
+                fmt = data[entry + 4:entry + 8]
+                codec = MP4_CODECS.get(fmt, fmt.decode("latin-1").strip())
+                # SampleEntry (8) + reserved (8) + channels (2) + size (2) + pre/reserved (4) + rate 16.16
+                channels, _, _, rate = struct.unpack_from(">HHII", data, entry + 8 + 16)
+                sample_rate = rate >> 16
+            elif box_type in MP4_CONTAINERS:
+                walk(body, box_stop)
+
+    walk(start, end)
+    return AudioInfo(duration, codec or "mp4", sample_rate, channels)
+
+
+def _probe_mp4(head, total_size, read_tail):
+    moov_offset = None
+
+    for box_type, box_start, body, box_end in _iter_boxes(head, 0, total_size or len(head)):
+        if box_type == b"moov":
+            if box_end <= len(head):
+                return _parse_moov(head, body, box_end)
+            moov_offset = box_start
+            break
+        if box_end > len(head):
+            # moov comes after a large mdat: look for it in the tail
+            moov_offset = box_end
+            break
+
+    if moov_offset is None or not (total_size and read_tail):
+        return AudioInfo(None, "mp4", None, None)
+
+    tail = read_tail()
+    tail_start = total_size - len(tail)
+    if moov_offset < tail_start:
+        return AudioInfo(None, "mp4", None, None)
+
+    local = moov_offset - tail_start
+    for box_type, _, body, box_end in _iter_boxes(tail, local, len(tail)):
+        if box_type == b"moov":
+            return _parse_moov(tail, body, box_end)
+
+    return AudioInfo(None, "mp4", None, None)
+
+
+# ============================================================
+# FLAC
+# ============================================================
+
+def _probe_flac(head):
+    # First metadata block is always STREAMINFO (34 bytes) after the 4-byte block header
+    info = head[8:8 + 18]
+    sample_rate = (info[10] << 12) | (info[11] << 4) | (info[12] >> 4)
+    channels = ((info[12] >> 1) & 0x07) + 1
+    total_samples = ((info[13] & 0x0F) << 32) | struct.unpack_from(">I", info, 14)[0]
+
+    duration = total_samples / sample_rate if sample_rate and total_samples else None
+    return AudioInfo(duration, "flac", sample_rate, channels)
+
+
+# ============================================================
+# OGG (Vorbis / Opus)
+# ============================================================
+
+def _probe_ogg(head, read_tail):
+    segments = head[26]
+    packet = 27 + segments
+
+    if head[packet:packet + 7] == b"\x01vorbis":
+        codec = "vorbis"
+        channels = head[packet + 11]
+        sample_rate = struct.unpack_from("<I", head, packet + 12)[0]
+        granule_rate, pre_skip = sample_rate, 0
+    elif head[packet:packet + 8] == b"OpusHead":
+        codec = "opus"
+        channels = head[packet + 9]
+        pre_skip = struct.unpack_from("<H", head, packet + 10)[0]
+        sample_rate = struct.unpack_from("<I", head, packet + 12)[0] or 48000
+        granule_rate = 48000  # Opus granules are always 48 kHz
+    else:
+        return AudioInfo(None, "ogg", None, None)
+
+    if not read_tail:
+        return AudioInfo(None, codec, sample_rate, channels)
+
+    tail = read_tail()
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail):
+        return AudioInfo(None, codec, sample_rate, channels)
+
+    granule = struct.unpack_from("<q", tail, last_page + 6)[0]
+    duration = max(granule - pre_skip, 0) / granule_rate if granule >= 0 else None
+    return AudioInfo(duration, codec, sample_rate, channels)
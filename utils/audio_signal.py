@@ -0,0 +1,292 @@
+# utils/audio_signal.py
+"""
+Lightweight PCM helpers for pre-transcription audio checks.
+
+PCM WAV is decoded with the stdlib; every other format is decoded by
+ffmpeg when it is on PATH. Frame energy uses NumPy when installed and
+falls back to pure Python otherwise (voicemails are short).
+"""
+
+import io
+import math
+import wave
+import shutil
+import logging
+import subprocess
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # optional speed-up
+    np = None
+
+logger = logging.getLogger(__name__)
+
+FFMPEG = shutil.which("ffmpeg")
+
+# Mono signed 16-bit samples
+PCMAudio = namedtuple("PCMAudio", ["samples", "sample_rate"])
+
+DEFAULT_DECODE_RATE = 16000
+FRAME_MS = 20
+SILENCE_THRESHOLD_DBFS = -45.0
+
+WAV_CONTENT_TYPES = {"audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave"}
+
+
+def decode_pcm(data, sample_rate=None):
+    """
+    Decodes audio bytes to mono 16-bit PCM. PCM WAV keeps its own rate;
+    ffmpeg decodes at sample_rate (default DEFAULT_DECODE_RATE).
+    Returns PCMAudio, or None if the format can't be decoded here.
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        pcm = _decode_wav(data)
+        if pcm is not None:
+            return pcm
+
+    if FFMPEG:
+        return _decode_ffmpeg(data, sample_rate or DEFAULT_DECODE_RATE)
+
+    return None
+
+
+def can_decode(key=None, codec=None, content_type=None):
+    """
+    Whether decode_pcm can handle this audio, judged from metadata only
+    so callers can skip the download: anything when ffmpeg is on PATH,
+    otherwise PCM WAV (probed codec, content type or key extension).
+    """
+    if FFMPEG:
+        return True
+    if codec is not None:
+        return codec in ("pcm", "wav")
+    if content_type and content_type.split(";")[0].strip().lower() in WAV_CONTENT_TYPES:
+        return True
+    return bool(key) and key.lower().endswith(".wav")
+
+
+def _decode_wav(data):
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if width == 2:
+        samples = array("h")
+        samples.frombytes(frames[:len(frames) - len(frames) % 2])
+    elif width == 1:
+        # 8-bit WAV is unsigned
+        samples = array("h", ((b - 128) << 8 for b in frames))
+    else:
+        return None
+
+    if channels > 1:
+        samples = _downmix(samples, channels)
+
+    return PCMAudio(samples, rate)
+
+
+def _downmix(samples, channels):
+    if np is not None:
+        mixed = np.frombuffer(samples.tobytes(), dtype=np.int16)
+        mixed = mixed[:len(mixed) - len(mixed) % channels].reshape(-1, channels).mean(axis=1)
+        return array("h", mixed.astype(np.int16).tobytes())
+
+    return array("h", (
+        sum(samples[i:i + channels]) // channels
+        for i in range(0, len(samples) - channels + 1, channels)
+    ))
+
+
+def _decode_ffmpeg(data, sample_rate):
+    try:
+        result = subprocess.run(
+            [FFMPEG, "-v", "error", "-i", "pipe:0",
+             "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+            input=data,
+            capture_output=True,
+            check=True,
+            timeout=120
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning(f"ffmpeg decode failed: {e}")
+        return None
+
+    samples = array("h")
+    samples.frombytes(result.stdout[:len(result.stdout) - len(result.stdout) % 2])
+    return PCMAudio(samples, sample_rate)
+
+
+def duration_seconds(pcm):
+    return len(pcm.samples) / pcm.sample_rate if pcm.sample_rate else 0.0
+
+
+def frame_dbfs(pcm, frame_ms=FRAME_MS):
+    """RMS level of each frame in dBFS (-inf for digital silence)."""
+    frame_len = max(int(pcm.sample_rate * frame_ms / 1000), 1)
+    count = len(pcm.samples) // frame_len
+    if not count:
+        return []
+
+    if np is not None:
+        frames = np.frombuffer(pcm.samples.tobytes(), dtype=np.int16)[:count * frame_len]
+        frames = frames.astype(np.float64).reshape(count, frame_len)
+        rms = np.sqrt((frames ** 2).mean(axis=1)) / 32768.0
+        with np.errstate(divide="ignore"):
+            return (20 * np.log10(rms)).tolist()
+
+    levels = []
+    samples = pcm.samples
+    for start in range(0, count * frame_len, frame_len):
+        energy = sum(s * s for s in samples[start:start + frame_len]) / frame_len
+        rms = math.sqrt(energy) / 32768.0
+        levels.append(20 * math.log10(rms) if rms > 0 else float("-inf"))
+    return levels
+
+
+def voiced_seconds(pcm, threshold_dbfs=SILENCE_THRESHOLD_DBFS, frame_ms=FRAME_MS):
+    """Total length of frames louder than threshold_dbfs."""
+    voiced = sum(1 for level in frame_dbfs(pcm, frame_ms) if level > threshold_dbfs)
+    return voiced * frame_ms / 1000
+
+
+# ------------------------
+# Preprocessing: trim, downsample, encode
+# ------------------------
+
+def trim_silence(pcm, threshold_dbfs=SILENCE_THRESHOLD_DBFS, frame_ms=FRAME_MS, padding_ms=250):
+    """
+    Drops leading/trailing frames quieter than threshold_dbfs, keeping
+    padding_ms on each side so word onsets aren't clipped.
+    Returns the input unchanged if nothing is above the threshold.
+    """
+    levels = frame_dbfs(pcm, frame_ms)
+    voiced = [i for i, level in enumerate(levels) if level > threshold_dbfs]
+    if not voiced:
+        return pcm
+
+    frame_len = max(int(pcm.sample_rate * frame_ms / 1000), 1)
+    pad = int(pcm.sample_rate * padding_ms / 1000)
+
+    start = max(voiced[0] * frame_len - pad, 0)
+    end = min((voiced[-1] + 1) * frame_len + pad, len(pcm.samples))
+    return PCMAudio(pcm.samples[start:end], pcm.sample_rate)
+
+
+def resample(pcm, sample_rate):
+    """
+    Downsamples to sample_rate. Never upsamples — lower-rate input is
+    returned unchanged.
+    """
+    if not pcm.sample_rate or pcm.sample_rate <= sample_rate or not pcm.samples:
+        return pcm
+
+    count = int(len(pcm.samples) * sample_rate / pcm.sample_rate)
+
+    if np is not None:
+        # Band-limited resample: truncate the spectrum above the new Nyquist
+        source = np.frombuffer(pcm.samples.tobytes(), dtype=np.int16).astype(np.float64)
+        spectrum = np.fft.rfft(source)[:count // 2 + 1]
+        resampled = np.fft.irfft(spectrum, count) * (count / len(source))
+        resampled = np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+        return PCMAudio(array("h", resampled.tobytes()), sample_rate)
+
+    # Box-filter each output sample over its source window (crude low-pass)
+    step = pcm.sample_rate / sample_rate
+    samples = pcm.samples
+    out = array("h")
+    for i in range(count):
+        lo = int(i * step)
+        hi = max(int((i + 1) * step), lo + 1)
+        window = samples[lo:hi]
+        out.append(sum(window) // len(window))
+    return PCMAudio(out, sample_rate)
+
+
+def encode_wav(pcm):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(pcm.sample_rate)
+        wav.writeframes(pcm.samples.tobytes())
+    return buf.getvalue()
+
+
+def encode_audio(pcm):
+    """
+    Encodes mono PCM for upload. FLAC (lossless, roughly half the size)
+    when ffmpeg is available, WAV otherwise.
+    Returns (bytes, extension, content_type).
+    """
+    if FFMPEG:
+        try:
+            result = subprocess.run(
+                [FFMPEG, "-v", "error", "-f", "s16le", "-ac", "1",
+                 "-ar", str(pcm.sample_rate), "-i", "pipe:0", "-f", "flac", "pipe:1"],
+                input=pcm.samples.tobytes(),
+                capture_output=True,
+                check=True,
+                timeout=120
+            )
+            return result.stdout, "flac", "audio/flac"
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning(f"ffmpeg FLAC encode failed, using WAV: {e}")
+
+    return encode_wav(pcm), "wav", "audio/wav"
+
+
+# ------------------------
+# Chunking on silence boundaries
+# ------------------------
+
+def split_on_silence(pcm, target_seconds, max_seconds, min_gap_ms=300,
+                     threshold_dbfs=SILENCE_THRESHOLD_DBFS, frame_ms=FRAME_MS):
+    """
+    Splits audio into ordered chunks of roughly target_seconds, cutting in
+    the middle of pauses at least min_gap_ms long so words aren't split.
+    Falls back to a hard cut at max_seconds when no pause is found.
+    Returns a list of PCMAudio.
+    """
+    frame_len = max(int(pcm.sample_rate * frame_ms / 1000), 1)
+    levels = frame_dbfs(pcm, frame_ms)
+    min_gap = max(min_gap_ms // frame_ms, 1)
+
+    # Candidate cut points (frame index) at the middle of each long pause
+    cuts = []
+    run_start = None
+    for i, level in enumerate(levels + [0.0]):
+        if level <= threshold_dbfs:
+            if run_start is None:
+                run_start = i
+        elif run_start is not None:
+            if i - run_start >= min_gap:
+                cuts.append((run_start + i) // 2)
+            run_start = None
+
+    target = int(target_seconds * 1000 / frame_ms)
+    longest = int(max_seconds * 1000 / frame_ms)
+    total = len(levels)
+
+    boundaries = [0]
+    while total - boundaries[-1] > longest:
+        start = boundaries[-1]
+        window = [c for c in cuts if start + target // 2 <= c <= start + longest]
+        if window:
+            end = min(window, key=lambda c: abs(c - (start + target)))
+        else:
+            end = start + longest
+        boundaries.append(end)
+
+    chunks = []
+    for i, start in enumerate(boundaries):
+        lo = start * frame_len
+        hi = boundaries[i + 1] * frame_len if i + 1 < len(boundaries) else len(pcm.samples)
+        chunks.append(PCMAudio(pcm.samples[lo:hi], pcm.sample_rate))
+    return chunks
@@ -0,0 +1,129 @@
+# utils/llm_schemas.py
+"""
+Validated result models for the LLM calls, and the strict JSON-schema
+response_format that constrains the model to them.
+
+A response that still fails validation is counted per schema instead of
+silently becoming a placeholder.
+"""
+
+import os
+import copy
+import logging
+import threading
+from collections import Counter
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# json_schema response_format needs gpt-4o-mini or newer
+OPENAI_STRUCTURED_MODEL = os.getenv("OPENAI_STRUCTURED_MODEL", "gpt-4o-mini")
+
+
+# ------------------------
+# Result models
+# ------------------------
+
+class PatientInfo(BaseModel):
+    patient_name: Optional[str]
+    patient_dob: Optional[str]
+    patient_phone: Optional[str]
+    call_reason: Optional[str]
+
+
+class VoicemailTriage(BaseModel):
+    # urgency_level first: streaming triage alerts on it (see ai_processor)
+    urgency_level: Literal["low", "medium", "high", "urgent"]
+    summary: str
+    recommended_action: str
+    department_routing: str
+
+
+class VoicemailSummary(BaseModel):
+    """VoicemailTriage without routing fields (plans without department_routing)"""
+    urgency_level: Literal["low", "medium", "high", "urgent"]
+    summary: str
+
+
+class CategoryTriage(BaseModel):
+    summary: str
+    category: Literal["Scheduling", "Refill", "Urgent", "General"]
+    confidence: float
+    reason: str
+
+
+class PsychTriage(BaseModel):
+    summary: str
+    urgency: Literal["urgent", "non_urgent"]
+
+
+# ------------------------
+# Strict response_format
+# ------------------------
+
+_schema_cache = {}
+
+
+def _strictify(node):
+    """Every property required, no extras, no titles/defaults (strict mode rules)."""
+    if isinstance(node, dict):
+        node.pop("title", None)
+        node.pop("default", None)
+        if node.get("type") == "object" and "properties" in node:
+            node["required"] = list(node["properties"])
+            node["additionalProperties"] = False
+        for value in node.values():
+            _strictify(value)
+    elif isinstance(node, list):
+        for value in node:
+            _strictify(value)
+    return node
+
+
+def response_format(model):
+    """OpenAI json_schema response_format for a pydantic model (cached)."""
+    if model not in _schema_cache:
+        schema = _strictify(copy.deepcopy(model.model_json_schema()))
+        _schema_cache[model] = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": model.__name__,
+                "schema": schema,
+                "strict": True
+            }
+        }
+    return _schema_cache[model]
+
+
+# ------------------------
+# Validation + parse-failure accounting
+# ------------------------
+
+_parse_failures = Counter()
+_parse_lock = threading.Lock()
+
+
+def parse_response(model, raw_text):
+    """
+    Validates a completion against model.
+    Returns the model instance, or None (and counts the failure).
+    """
+    try:
+        return model.model_validate_json(raw_text or "")
+    except ValidationError as e:
+        with _parse_lock:
+            _parse_failures[model.__name__] += 1
+            count = _parse_failures[model.__name__]
+        logger.warning(
+            f"{model.__name__} response failed validation ({count} so far): "
+            f"{e.error_count()} errors. Raw response: {(raw_text or '')[:200]}"
+        )
+        return None
+
+
+def parse_failure_counts():
+    """Parse failures per schema since process start."""
+    with _parse_lock:
+        return dict(_parse_failures)
@@ -0,0 +1,67 @@
+# utils/stage_graph.py
+"""
+Minimal dependency-graph executor for per-voicemail pipeline stages.
+
+Each stage runs as soon as everything it depends on has finished, so
+independent stages overlap and wall-clock time is the critical path
+rather than the sum. Stage functions must not touch the DB session
+(they run on pool threads without an app context).
+"""
+
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+# func(results) -> result, where results holds every finished stage by name
+Stage = namedtuple("Stage", ["name", "func", "deps"])
+
+
+def stage(name, func, deps=()):
+    return Stage(name, func, tuple(deps))
+
+
+def run_stage_graph(stages, max_workers=None):
+    """
+    Runs stages respecting deps. Returns {name: result}.
+    The first stage exception is re-raised once running stages finish;
+    stages that haven't started by then are skipped.
+    """
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage {s.name} depends on unknown stages: {missing}")
+
+    results = {}
+    pending = dict(by_name)
+    running = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(stages), 1)) as pool:
+        while pending or running:
+            if error is None:
+                ready = [s for s in pending.values() if all(d in results for d in s.deps)]
+                for s in ready:
+                    del pending[s.name]
+                    running[pool.submit(s.func, dict(results))] = s.name
+
+            if not running:
+                if pending and error is None:
+                    raise ValueError(f"Dependency cycle between stages: {sorted(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"❌ Stage {name} failed: {e}")
+                    error = error or e
+
+    if error is not None:
+        raise error
+
+    return results
@@ -15,13 +15,28 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 # ----------------------------
 # Imports
 # ----------------------------
-from database import db, Voicemail
-from utils.ai_processor import VoicemailAIProcessor
+from database import db, Voicemail, StaleVoicemailState
+from utils.ai_processor import VoicemailAIProcessor, apply_analysis_results
 from run import app  # Flask app for context
 
 # ✅ STEP 2.1 — ADDED IMPORTS
-from services.email_service import send_email
-from database import Clinic
+from services.notification_service import send_clinic_notification, make_urgent_alert
+from services.clinic_cache import get_clinic_route
+from services.triage_service import analyze_transcription, keyword_analysis
+from services.triage_cards import triage_card_values, upsert_triage_cards
+from billing.pipeline import get_pipeline_stages
+from utils.stage_graph import stage, run_stage_graph
+from services.audio_screening import screen_voicemail
+from services.audio_preprocessing import preprocess_voicemail
+from services.chunked_transcription import transcribe_chunked
+from services.llm_batch import should_defer, start_lane_scheduler
+from utils.llm_schemas import parse_failure_counts
+from services.deepgram_callback import (
+    callback_enabled,
+    callback_url_for,
+    requeue_stale_callbacks,
+    DEEPGRAM_CALLBACK_TIMEOUT
+)
 
 # ----------------------------
 # Logger
@@ -29,51 +44,180 @@ from database import Clinic
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
+# Serialize triage behind extraction (patient info in the triage prompt)
+# instead of running them side by side
+TRIAGE_USES_EXTRACTION = os.getenv("TRIAGE_USES_EXTRACTION", "false").lower() == "true"
+
+# How often the worker logs its LLM parse-failure totals (seconds)
+PARSE_FAILURE_REPORT_INTERVAL = int(os.getenv("PARSE_FAILURE_REPORT_INTERVAL", "3600"))
+
+# Paid-for work that survives a failed run (see worker_loop's except)
+TRANSCRIPTION_COLUMNS = (
+    "transcript",
+    "transcription_confidence",
+    "transcription_provider",
+    "transcribed_at",
+    "processed_audio_url",
+    "preprocess_bytes_saved",
+    "preprocess_seconds_saved",
+)
+
 # ----------------------------
 # Helper: Get next voicemail to process
 # ----------------------------
 def get_next_voicemail():
+    # "transcribed" = transcript delivered by the Deepgram callback webhook
     return (
         db.session.query(Voicemail)
-        .filter_by(status="received")
+        .filter(Voicemail.status.in_(("received", "transcribed")))
         .order_by(Voicemail.id.asc())
         .first()
     )
 
-# ✅ FIXED NOTIFICATION FUNCTION (SAFE — NO CRASH)
-def send_clinic_notification(voicemail):
-
-    clinic = Clinic.query.get(voicemail.clinic_id)
-
-    if not clinic:
-        print("Clinic not found. Skipping email.")
-        return
-
-    if not clinic.email:
-        print("Clinic email not configured. Skipping email.")
-        return
-
-    subject = f"New Voicemail - {(voicemail.urgency_level or 'unknown').upper()}"
+# ----------------------------
+# Helper: Close out hang-ups / silence without provider calls
+# ----------------------------
+def mark_empty_voicemail(voicemail, screening):
+    voicemail.transcript = ""
+    voicemail.transcription_confidence = None
+    voicemail.transcription_provider = "silence_detector"
+    voicemail.transcribed_at = datetime.utcnow()
+    voicemail.summary = f"Empty voicemail: {screening.reason}"
+    voicemail.triage_category = "empty"
+    voicemail.urgency_level = "low"
+    voicemail.update_status("completed")
 
-    html_content = f"""
-    <h2>New Voicemail Received</h2>
+# ----------------------------
+# Transcription stage
+# ----------------------------
+def transcribe_voicemail(ai_processor, voicemail):
+    """
+    Screens, preprocesses and transcribes a received voicemail.
+    Returns True when the transcript is on the voicemail, False when the
+    worker should move on (empty audio, or handed to a Deepgram callback).
+    """
 
-    <p><strong>Summary:</strong> {voicemail.summary or 'N/A'}</p>
-    <p><strong>Urgency:</strong> {voicemail.urgency_level or 'N/A'}</p>
-    <p><strong>Triage Category:</strong> {voicemail.triage_category or 'N/A'}</p>
+    # Transcript kept from an earlier failed run: don't pay for it twice
+    if voicemail.transcribed_at is not None:
+        logger.info(f"♻️ Voicemail {voicemail.id} already transcribed, reusing the transcript")
+        voicemail.update_status("transcribed")
+        return True
+
+    # ----------------------------
+    # EMPTY / SILENCE SCREENING (no provider calls)
+    # ----------------------------
+    screening = screen_voicemail(voicemail)
+    if screening.is_empty:
+        logger.info(f"🔇 Voicemail {voicemail.id} is empty ({screening.reason}), skipping AI")
+        mark_empty_voicemail(voicemail, screening)
+        return False
+
+    # ----------------------------
+    # PREPROCESSING (optional trim + downsample)
+    # ----------------------------
+    if not voicemail.processed_audio_url:
+        processed = preprocess_voicemail(voicemail)
+        if processed:
+            voicemail.processed_audio_url = processed.key
+            voicemail.preprocess_bytes_saved = processed.bytes_saved
+            voicemail.preprocess_seconds_saved = processed.seconds_saved
+            logger.info(
+                f"✂️ Preprocessed voicemail {voicemail.id}: "
+                f"{processed.seconds_saved}s / {processed.bytes_saved} bytes saved"
+            )
+
+    audio_key = voicemail.processed_audio_url or voicemail.audio_url
+
+    # ----------------------------
+    # CALLBACK MODE: submit and free this worker
+    # ----------------------------
+    if callback_enabled():
+        # Committed before submitting: a fast callback must find the row
+        # already waiting (the request id follows once Deepgram returns it)
+        voicemail.transcription_request_id = None
+        voicemail.transcription_submitted_at = datetime.utcnow()
+        voicemail.update_status("awaiting_transcript")
+
+        request_id = ai_processor.submit_transcription(audio_key, callback_url_for(voicemail.id))
+        voicemail.transcription_request_id = request_id
+        db.session.commit()
+        logger.info(f"📤 Voicemail {voicemail.id} submitted to Deepgram (request {request_id})")
+        return False
+
+    # ----------------------------
+    # TRANSCRIPTION
+    # ----------------------------
+    logger.info("📝 Starting transcription...")
+    voicemail.advance("transcribing")
+
+    # Long recordings: split on pauses, chunks in parallel
+    chunked = transcribe_chunked(ai_processor, voicemail)
+    if chunked is not None:
+        transcript, confidence = chunked
+    else:
+        transcript, confidence = ai_processor.transcribe_audio(audio_key)
+    logger.info(f"✅ Transcription completed: {len(transcript)} chars, confidence={confidence}")
 
-    <hr>
+    voicemail.transcript = transcript
+    voicemail.transcription_confidence = confidence
+    voicemail.transcribed_at = datetime.utcnow()
+    return True
 
-    <p><strong>Full Transcript:</strong></p>
-    <p>{voicemail.transcript or 'N/A'}</p>
+# ----------------------------
+# Crisis second pass (never fails the voicemail)
+# ----------------------------
+def crisis_review(transcript):
     """
+    Model crisis review, falling back to the keyword check when the call
+    fails or the response is unusable, so the paid triage result isn't
+    lost and a keyword hit still goes to review.
+    """
+    try:
+        analysis = analyze_transcription(transcript)
+    except Exception as e:
+        logger.error(f"❌ Crisis review failed, using keyword check: {e}")
+        analysis = None
 
-    success = send_email(clinic.email, subject, html_content)
+    return analysis or keyword_analysis(transcript)
 
-    if success:
-        print(f"✅ Notification email sent to {clinic.email}")
-    else:
-        print("❌ Email sending failed.")
+# ----------------------------
+# Post-transcription analysis graph
+# ----------------------------
+def build_analysis_graph(ai_processor, voicemail, stages):
+    """
+    Extraction, triage and crisis review only need the transcript, so they
+    run concurrently. With TRIAGE_USES_EXTRACTION, triage waits for
+    extraction and gets the patient info in its prompt.
+    """
+    transcript = voicemail.transcript
+    routing = "department_routing" in stages
+    on_urgent = make_urgent_alert(voicemail) if "urgent_alert" in stages else None
+    triage_after_extraction = TRIAGE_USES_EXTRACTION and "extraction" in stages
+
+    graph = []
+
+    if "extraction" in stages:
+        graph.append(stage(
+            "extraction",
+            lambda results: ai_processor.extract_patient_info(transcript)
+        ))
+
+    if "triage" in stages:
+        graph.append(stage(
+            "triage",
+            lambda results: ai_processor.summarize_and_triage(
+                transcript,
+                results.get("extraction") if triage_after_extraction else None,
+                on_urgent=on_urgent,
+                routing=routing
+            ),
+            deps=("extraction",) if triage_after_extraction else ()
+        ))
+
+    if "crisis_review" in stages:
+        graph.append(stage("crisis_review", lambda results: crisis_review(transcript)))
+
+    return graph
 
 # ----------------------------
 # Main worker loop
@@ -81,10 +225,31 @@ def send_clinic_notification(voicemail):
 def worker_loop():
     logger.info("🔥 Background Worker Starting...")
     ai_processor = VoicemailAIProcessor()
+
+    # Overnight batch lane jobs live with the worker that defers voicemails
+    start_lane_scheduler(app)
+
     logger.info("🚀 Worker loop running...")
 
+    last_requeue_check = 0.0
+    last_parse_report = time.monotonic()
+    reported_failures = {}
+
     while True:
+        # Paid-for completions that failed schema validation, per schema
+        if time.monotonic() - last_parse_report > PARSE_FAILURE_REPORT_INTERVAL:
+            failures = parse_failure_counts()
+            if failures != reported_failures:
+                logger.warning(f"📊 LLM parse failures since start: {failures}")
+                reported_failures = failures
+            last_parse_report = time.monotonic()
+
         with app.app_context():
+            # Lost Deepgram callbacks go back in the queue
+            if callback_enabled() and time.monotonic() - last_requeue_check > DEEPGRAM_CALLBACK_TIMEOUT / 4:
+                requeue_stale_callbacks()
+                last_requeue_check = time.monotonic()
+
             voicemail = get_next_voicemail()
 
             if not voicemail:
@@ -95,61 +260,79 @@ def worker_loop():
 
             try:
                 # ----------------------------
-                # TRANSCRIPTION
+                # TRANSCRIPTION (skipped if a Deepgram callback already delivered it)
                 # ----------------------------
-                logger.info("📝 Starting transcription...")
-                voicemail.status = "transcribing"
-                db.session.commit()
-
-                transcript, confidence = ai_processor.transcribe_audio(voicemail.audio_url)
-                logger.info(f"✅ Transcription completed: {len(transcript)} chars, confidence={confidence}")
+                if voicemail.status == "received":
+                    if not transcribe_voicemail(ai_processor, voicemail):
+                        continue
 
-                voicemail.transcript = transcript
-                voicemail.transcription_confidence = confidence
-                voicemail.transcribed_at = datetime.utcnow()
+                transcript = voicemail.transcript
 
                 # ----------------------------
-                # EXTRACTION
+                # OVERNIGHT BATCH LANE (non-urgent, after hours)
                 # ----------------------------
-                logger.info("🔍 Starting patient info extraction...")
-                voicemail.status = "extracting"
-                db.session.commit()
+                if should_defer(voicemail):
+                    logger.info(f"🌙 Voicemail {voicemail.id} deferred to the overnight batch")
+                    voicemail.update_status("deferred")
+                    continue
 
-                patient_info = ai_processor.extract_patient_info(transcript)
-                logger.info(f"✅ Extraction completed: {patient_info}")
+                # Stages this clinic's plan (or override) pays for
+                stages = get_pipeline_stages(get_clinic_route(voicemail.clinic_id))
+                routing = "department_routing" in stages
 
                 # ----------------------------
-                # SUMMARIZATION & TRIAGE
+                # EXTRACTION / TRIAGE / CRISIS REVIEW (concurrent)
                 # ----------------------------
-                logger.info("🧠 Starting summarization & triage...")
-                voicemail.status = "summarizing"
-                db.session.commit()
+                graph = build_analysis_graph(ai_processor, voicemail, stages)
+                results = {}
 
-                summary_data = ai_processor.summarize_and_triage(transcript, patient_info)
-                logger.info(f"✅ Summarization completed: {summary_data}")
+                if graph:
+                    logger.info(f"🧠 Running {', '.join(s.name for s in graph)}...")
+                    voicemail.advance("summarizing")
+
+                    results = run_stage_graph(graph)
+                    logger.info(f"✅ Analysis completed: {results}")
 
                 # ----------------------------
-                # SAVE RESULTS
+                # SAVE RESULTS (one transaction: results, card, final status)
                 # ----------------------------
-                if summary_data.get("success"):
-                    voicemail.summary = summary_data.get("summary")
-                    voicemail.triage_category = summary_data.get("department_routing")
-                    voicemail.urgency_level = summary_data.get("urgency_level")
+                final_status, crisis_flag = apply_analysis_results(voicemail, results, routing=routing)
+                voicemail.update_status(final_status, commit=False)
+
+                # Digest card (upsert: retries overwrite)
+                if "triage_card" in stages:
+                    upsert_triage_cards([triage_card_values(voicemail, crisis_flag)])
 
-                voicemail.status = "completed"
                 db.session.commit()
 
                 # ✅ Call notification AFTER completion
-                send_clinic_notification(voicemail)
+                if "notification" in stages:
+                    send_clinic_notification(voicemail)
 
                 logger.info(f"🏁 Voicemail {voicemail.id} fully completed")
 
+            except StaleVoicemailState as e:
+                # Someone else moved it on (reaper, admin, another worker): their state wins
+                db.session.rollback()
+                logger.warning(f"⚠️ Dropping stale work on voicemail {voicemail.id}: {e}")
+
             except Exception as e:
                 logger.error(f"❌ Pipeline failed for voicemail {voicemail.id}: {e}", exc_info=True)
-                voicemail.status = "failed"
-                voicemail.failure_reason = str(e)
-                voicemail.last_error_at = datetime.utcnow()
-                db.session.commit()
+                # Drop uncommitted (coalesced) stage writes, then record the
+                # failure, keeping the transcript so a retry doesn't redo it
+                kept = (
+                    {column: getattr(voicemail, column) for column in TRANSCRIPTION_COLUMNS}
+                    if voicemail.transcribed_at is not None else {}
+                )
+                db.session.rollback()
+                for column, value in kept.items():
+                    setattr(voicemail, column, value)
+                try:
+                    voicemail.update_status("failed", failure_reason=str(e))
+                except StaleVoicemailState as stale:
+                    # Moved on meanwhile: their state wins over our failure
+                    db.session.rollback()
+                    logger.warning(f"⚠️ Not marking voicemail {voicemail.id} failed: {stale}")
 
             time.sleep(1)
 